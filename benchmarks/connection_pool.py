@@ -0,0 +1,48 @@
+import time
+import argparse
+import tempfile
+
+from urllib.request import urlopen
+
+from lib.connection_pool import ConnectionPool
+from benchmarks.local_server import start_server, write_files
+
+
+def download_with_urlopen(url, filenames):
+    for filename in filenames:
+        with urlopen('{}/{}'.format(url, filename)) as response:
+            response.read()
+
+
+def download_with_pool(url, filenames):
+    connection_pool = ConnectionPool()
+
+    for filename in filenames:
+        with connection_pool.open('{}/{}'.format(url, filename)) as response:
+            response.read()
+
+    connection_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.connection_pool', description='Files/s with a new connection per file against the keep-alive pool')
+    parser.add_argument('-n', '--files', type=int, default=500, help='files to download, defaults to 500')
+    parser.add_argument('-s', '--size', type=int, default=2048, help='size of each file in bytes, defaults to 2048')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        filenames = write_files(root, [args.size] * args.files)
+        server, url = start_server(root)
+
+        for name, download in (('urlopen', download_with_urlopen), ('pool', download_with_pool)):
+            start_time = time.perf_counter()
+            download(url, filenames)
+            elapsed_time = time.perf_counter() - start_time
+
+            print('{:8} {:8.0f} files/s'.format(name, len(filenames) / elapsed_time))
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
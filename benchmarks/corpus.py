@@ -0,0 +1,48 @@
+import os
+import lzma
+import lzham
+import random
+import zstandard
+
+
+def csv_like(size, seed=0):
+    # Rows of names and numbers, compresses about as well as the game CSV files
+    rng = random.Random(seed)
+    rows = ['Name,Rarity,Cost,Hitpoints,Damage\n', 'String,String,int,int,int\n']
+    length = sum(map(len, rows))
+
+    while length < size:
+        row = '{},{},{},{},{}\n'.format(rng.choice(['Knight', 'Archer', 'Giant', 'Goblin', 'Wizard']) + str(rng.randrange(1000)),
+                                        rng.choice(['Common', 'Rare', 'Epic', 'Legendary']),
+                                        rng.randrange(10), rng.randrange(5000), rng.randrange(800))
+        rows.append(row)
+        length += len(row)
+
+    return ''.join(rows).encode()[:size]
+
+
+def sc_header(version=1):
+    # SC magic, version and a 16 bytes hash, the compressed payload follows
+    return b'SC' + version.to_bytes(4, 'big') + (16).to_bytes(4, 'big') + os.urandom(16)
+
+
+def lzma_blob(data, preset=1):
+    # Game LZMA files keep 4 bytes of the 8 bytes uncompressed size the .lzma format has
+    compressed = lzma.compress(data, format=lzma.FORMAT_ALONE, preset=preset)
+
+    return sc_header() + compressed[:5] + len(data).to_bytes(4, 'little') + compressed[13:]
+
+
+def sclz_blob(data, dict_size_log2=18):
+    # SCLZ magic, the dictionary size and the 4 bytes uncompressed size before the LZHAM stream
+    compressed = lzham.compress(data, {'dict_size_log2': dict_size_log2})
+
+    return sc_header() + b'SCLZ' + bytes([dict_size_log2]) + len(data).to_bytes(4, 'little') + compressed
+
+
+def zstd_blob(data, frames=1, level=3):
+    # Newer SC files, a version 3 header followed by one or more Zstandard frames
+    compressor = zstandard.ZstdCompressor(level=level)
+    frame_size = -(-len(data) // frames)
+
+    return sc_header(3) + b''.join(compressor.compress(data[start:start + frame_size]) for start in range(0, len(data), frame_size))
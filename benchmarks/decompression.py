@@ -0,0 +1,118 @@
+import os
+import lzma
+import lzham
+import argparse
+import tempfile
+import tracemalloc
+
+from timeit import repeat
+
+from lib.compression import decompress, decompress_file
+from benchmarks.corpus import csv_like, lzma_blob, sclz_blob, zstd_blob
+
+
+def legacy_decompress(data):
+    # lib/compression.decompress before the memoryview rework, kept here as the reference
+    if data[:2] == b'SC':  # Supercell header
+        hash_length = int.from_bytes(data[6:10], 'big')
+        data = data[10 + hash_length:]
+
+    if data[:4] == b'SCLZ':  # LZHAM compression
+        dict_size = int.from_bytes(data[4:5], 'big')
+        uncompressed_size = int.from_bytes(data[5:9], 'little')
+
+        try:
+            return lzham.decompress(data[9:], uncompressed_size, {'dict_size_log2': dict_size})
+
+        except:
+            return data
+
+    else:  # LZMA compression
+        adjusted_data = data[0:9] + bytes(4) + data[9:]
+
+        try:
+            return lzma.LZMADecompressor().decompress(adjusted_data)
+
+        except:
+            return data
+
+
+def current_decompress(data):
+    return decompress(data).data
+
+
+class StreamedDecompress:
+
+    # decompress_file from a file already on disk, like the decompression stage does after a download
+
+    def __init__(self, root):
+        self.source_path = os.path.join(root, 'source')
+        self.destination_path = os.path.join(root, 'destination')
+
+    def __call__(self, blob):
+        if not os.path.isfile(self.source_path):
+            with open(self.source_path, 'wb') as f:
+                f.write(blob)
+
+        return decompress_file(self.source_path, self.destination_path)
+
+    def output(self, blob):
+        if not self(blob).success:
+            return None
+
+        with open(self.destination_path, 'rb') as f:
+            return f.read()
+
+
+def corpus(data):
+    return [('sc+lzma', lzma_blob(data)), ('sc+sclz', sclz_blob(data)), ('sc+zstd', zstd_blob(data)),
+            ('sc+zstd x8', zstd_blob(data, 8)), ('raw', data)]
+
+
+def throughput(function, blob, output_size, repeat_count):
+    # Best of several runs, in MB of decompressed data per second
+    return output_size / min(repeat(lambda: function(blob), number=1, repeat=repeat_count)) / 1024 / 1024
+
+
+def peak_allocation(function, blob):
+    # Python allocations only, the codecs' own working memory isn't traced
+    tracemalloc.start()
+
+    try:
+        function(blob)
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.decompression', description='Decompression throughput and allocations per codec, legacy decompress against the current one')
+    parser.add_argument('-s', '--size', type=int, default=16, help='decompressed size of each blob in MB, defaults to 16')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per measure, the best one is kept, defaults to 5')
+    args = parser.parse_args()
+
+    data = csv_like(args.size * 1024 * 1024)
+
+    print('{:10} {:8} {:>10} {:>10} {:>16}'.format('format', 'version', 'input MB', 'MB/s', 'peak alloc MB'))
+
+    for format, blob in corpus(data):
+        with tempfile.TemporaryDirectory() as root:
+            streamed_decompress = StreamedDecompress(root)
+
+            for version, function, output in (('legacy', legacy_decompress, legacy_decompress),
+                                              ('current', current_decompress, current_decompress),
+                                              ('streamed', streamed_decompress, streamed_decompress.output)):
+
+                # The legacy code passes Zstandard through still compressed, and only compressed files are streamed
+                if output(blob) != data:
+                    print('{:10} {:8} {:>10}'.format(format, version, 'unsupported'))
+                    continue
+
+                print('{:10} {:8} {:10.1f} {:10.1f} {:16.1f}'.format(format, version, len(blob) / 1024 / 1024,
+                                                                     throughput(function, blob, len(data), args.repeat),
+                                                                     peak_allocation(function, blob) / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
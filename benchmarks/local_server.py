@@ -0,0 +1,66 @@
+import os
+import time
+import threading
+
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+class FileRequestHandler(SimpleHTTPRequestHandler):
+
+    # Keep-alive like the assets hosts, SimpleHTTPRequestHandler defaults to closing after each file
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body go out as separate writes, Nagle would hold the body until the client acks the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        super().do_GET()
+
+    def copyfile(self, source, outputfile):
+        if not self.server.rate:
+            return super().copyfile(source, outputfile)
+
+        # Throttled per connection like a CDN edge, so big files take long enough for their ordering to matter
+        while True:
+            chunk = source.read(64 * 1024)
+
+            if not chunk:
+                return
+
+            outputfile.write(chunk)
+            time.sleep(len(chunk) / self.server.rate)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(root, delay=0, rate=0):
+    # Serves root on a free local port from a background thread, returns the server and its url
+    server = ThreadingHTTPServer(('127.0.0.1', 0), lambda *args: FileRequestHandler(*args, directory=root))
+    server.daemon_threads = True
+    server.delay = delay
+    server.rate = rate
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def write_files(root, sizes):
+    # Random content so decompressors and hashes get realistic work, returns the file names in order
+    os.makedirs(root, exist_ok=True)
+
+    filenames = []
+
+    for index, size in enumerate(sizes):
+        filename = 'file_{}.bin'.format(index)
+
+        with open(os.path.join(root, filename), 'wb') as f:
+            f.write(os.urandom(size))
+
+        filenames.append(filename)
+
+    return filenames
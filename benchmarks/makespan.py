@@ -0,0 +1,89 @@
+import os
+import json
+import random
+import hashlib
+import argparse
+import tempfile
+
+from lib.downloader import Downloader
+from benchmarks.local_server import start_server
+
+
+MASTERHASH = 'makespan'
+
+
+def patch_sizes(seed=0):
+    # Shaped like a patch: lots of small CSV files, some textures and a few big SC files last in the fingerprint
+    rng = random.Random(seed)
+
+    files = [('csv/file_{}.csv'.format(index), rng.randrange(1024, 48 * 1024)) for index in range(300)]
+    files += [('sc/texture_{}.png'.format(index), rng.randrange(128 * 1024, 1024 * 1024)) for index in range(30)]
+    files += [('sc/big_{}_tex.sc'.format(index), rng.randrange(6, 10) * 1024 * 1024) for index in range(6)]
+
+    return files
+
+
+def write_patch(root, files, seed):
+    # New content on every patch so none of the shas are known yet, only the extensions
+    fingerprint = {'sha': MASTERHASH, 'files': []}
+
+    for filename, size in files:
+        path = os.path.join(root, MASTERHASH, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = seed.to_bytes(4, 'big') + os.urandom(size - 4)
+
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        fingerprint['files'].append({'file': filename, 'sha': hashlib.sha1(data).hexdigest()})
+
+    with open(os.path.join(root, MASTERHASH, 'fingerprint.json'), 'w') as f:
+        json.dump(fingerprint, f)
+
+    return fingerprint
+
+
+def makespan(fingerprint, url, output_path, workers_count):
+    downloader = Downloader(fingerprint, [url], output_path, workers_count=workers_count, overwrite=True)
+    downloader.prepare()
+    downloader.run()
+
+    assert not downloader.failed_files, downloader.failed_files
+
+    return downloader.metrics.elapsed_time()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.makespan', description='Makespan of a patch download in fingerprint order against biggest files first')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='workers count, defaults to 8')
+    parser.add_argument('-r', '--rate', type=float, default=5, help='throughput of each connection in MB/s, defaults to 5')
+    parser.add_argument('-d', '--delay', type=float, default=0.005, help='latency of each request in seconds, defaults to 0.005')
+    args = parser.parse_args()
+
+    files = patch_sizes()
+
+    with tempfile.TemporaryDirectory() as root:
+        served_dir = os.path.join(root, 'served')
+        output_path = os.path.join(root, 'output')
+
+        server, url = start_server(served_dir, args.delay, args.rate * 1024 * 1024)
+
+        print('{} files, {:.1f} MB, {} workers, {} MB/s per connection'.format(len(files), sum(size for _, size in files) / 1024 / 1024, args.workers, args.rate))
+
+        # Nothing known yet, the queue follows the fingerprint and the big files start last
+        fingerprint = write_patch(served_dir, files, 0)
+        print('{:24} {:6.2f} s'.format('fingerprint order', makespan(fingerprint, url, output_path, args.workers)))
+
+        # Same patch again, every size is known from the previous run
+        print('{:24} {:6.2f} s'.format('known sizes', makespan(fingerprint, url, output_path, args.workers)))
+
+        # A new patch where every file changed, only the extension averages saved by the previous runs help
+        fingerprint = write_patch(served_dir, files, 1)
+        print('{:24} {:6.2f} s'.format('extension averages', makespan(fingerprint, url, output_path, args.workers)))
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
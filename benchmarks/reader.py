@@ -0,0 +1,148 @@
+import json
+import zlib
+import random
+import socket
+import argparse
+import threading
+
+from io import BytesIO
+from timeit import repeat
+
+from lib.reader import Reader
+from lib.protocol import receive, read_assets_info
+from tests.fake_game_server import build_login_failed, encode_vint
+
+
+class LegacyReader(BytesIO):
+
+    # lib/reader.Reader before the memoryview rework, kept here as the reference
+
+    def read_byte(self):
+        return int.from_bytes(self.read(1), 'big')
+
+    def read_int(self):
+        return int.from_bytes(self.read(4), 'big')
+
+    def read_vint(self):
+        shift = 0
+        result = 0
+
+        while True:
+            i = self.read_byte()
+
+            if shift == 0:
+                seventh = (i & 0x40) >> 6  # save 7th bit
+                msb = (i & 0x80) >> 7  # save msb
+                i <<= 1  # rotate to the left
+                i &= ~(0x181)  # clear 8th and 1st bit and 9th if any
+                i |= (msb << 7) | (seventh)  # insert msb and 6th back in
+
+            result |= (i & 0x7f) << shift
+            shift += 7
+
+            if not i & 0x80:
+                break
+
+        return ((result) >> 1) ^ (-((result) & 1))
+
+    def read_string(self):
+        length = self.read_int()
+
+        if length != 0xffffffff:
+            return self.read(length).decode('utf-8')
+
+    def read_compressed_string(self):
+        length = self.read_int()
+
+        if length != 0xffffffff:
+            zlength = int.from_bytes(self.read(4), 'little')
+            return zlib.decompress(self.read(length - 4), 15, zlength).decode('utf-8')
+
+
+def legacy_receive(s, length):
+    # The receive loop of request_login_failed before recv_into
+    message = b''
+
+    while length:
+        data = s.recv(length)
+        length -= len(data)
+        message += data
+
+    return message
+
+
+def fingerprint_like(files_count, seed=0):
+    rng = random.Random(seed)
+
+    return json.dumps({'sha': '%040x' % rng.getrandbits(160),
+                       'files': [{'file': 'csv_logic/file_{}.csv'.format(index), 'sha': '%040x' % rng.getrandbits(160)} for index in range(files_count)]})
+
+
+def read_login_failed(reader_class, payload):
+    login_failed = reader_class(payload)
+    login_failed.read_vint()
+
+    return read_assets_info(login_failed)
+
+
+def read_vints(reader_class, payload, count):
+    reader = reader_class(payload)
+
+    for _ in range(count):
+        reader.read_vint()
+
+
+def receive_message(function, payload):
+    sender, receiver = socket.socketpair()
+
+    # Sent from another thread like a server would, the receiver gets it in whatever chunks the kernel hands out
+    thread = threading.Thread(target=sender.sendall, args=(payload,))
+    thread.start()
+
+    try:
+        assert function(receiver, len(payload)) == payload
+
+    finally:
+        thread.join()
+        sender.close()
+        receiver.close()
+
+
+def best_time(function, repeat_count):
+    return min(repeat(function, number=1, repeat=repeat_count))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.reader', description='Protocol Reader and socket receive, legacy against current, on login failed payloads')
+    parser.add_argument('-n', '--files', type=int, default=3000, help='files in the fingerprint of the login failed payload, defaults to 3000')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='runs per measure, the best one is kept, defaults to 20')
+    args = parser.parse_args()
+
+    fingerprint = fingerprint_like(args.files)
+    login_failed = build_login_failed(7, ['https://game-assets.clashroyaleapp.com', 'https://game-assets-backup.clashroyaleapp.com'], fingerprint)
+
+    assert read_login_failed(LegacyReader, login_failed) == read_login_failed(Reader, login_failed)
+
+    # Every vint length, from one to five bytes
+    rng = random.Random(0)
+    values = [rng.randrange(-2 ** 31, 2 ** 31) >> rng.randrange(32) for _ in range(100000)]
+    vints = b''.join(encode_vint(value) for value in values)
+
+    print('login failed payload: {:.1f} KB, fingerprint of {} files'.format(len(login_failed) / 1024, args.files))
+
+    for name, legacy, current in (('read login failed', lambda: read_login_failed(LegacyReader, login_failed), lambda: read_login_failed(Reader, login_failed)),
+                                  ('read 100000 vints', lambda: read_vints(LegacyReader, vints, len(values)), lambda: read_vints(Reader, vints, len(values)))):
+        legacy_time, current_time = best_time(legacy, args.repeat), best_time(current, args.repeat)
+
+        print('{:24} legacy {:8.2f} ms  current {:8.2f} ms  x{:.1f}'.format(name, legacy_time * 1000, current_time * 1000, legacy_time / current_time))
+
+    for size in (len(login_failed), 4 * 1024 * 1024, 32 * 1024 * 1024):
+        payload = bytes(size)
+        legacy_time = best_time(lambda: receive_message(legacy_receive, payload), min(args.repeat, 5))
+        current_time = best_time(lambda: receive_message(receive, payload), min(args.repeat, 5))
+
+        print('{:24} legacy {:8.2f} ms  current {:8.2f} ms  x{:.1f}'.format('receive {:.1f} KB'.format(size / 1024), legacy_time * 1000, current_time * 1000, legacy_time / current_time))
+
+
+if __name__ == '__main__':
+    main()
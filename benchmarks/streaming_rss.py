@@ -0,0 +1,102 @@
+import os
+import sys
+import lzma
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.metrics import PipelineMetrics
+from lib.rate_limiter import TokenBucket
+from lib.connection_pool import ConnectionPool
+from lib.transfer import download_file, save_file
+from benchmarks.corpus import csv_like, lzma_blob
+from benchmarks.local_server import start_server
+
+
+def legacy_decompress(data):
+    # lib/compression.decompress before streaming, kept here as the reference
+    hash_length = int.from_bytes(data[6:10], 'big')
+    data = data[10 + hash_length:]
+
+    return lzma.LZMADecompressor().decompress(data[0:9] + bytes(4) + data[9:])
+
+
+def download_buffered(url, path):
+    with urlopen(url) as response:
+        data = response.read()
+
+    with open(path, 'wb') as f:
+        f.write(legacy_decompress(data))
+
+
+def download_streamed(url, path, connection_pool):
+    part_path, _, _ = download_file(connection_pool, url, path, TokenBucket(), PipelineMetrics())
+    save_file(part_path, path, True)
+
+
+def run(mode, url, filenames, output_dir, workers_count):
+    connection_pool = ConnectionPool()
+
+    def download(filename):
+        path = os.path.join(output_dir, filename)
+
+        if mode == 'buffered':
+            download_buffered('{}/{}'.format(url, filename), path)
+
+        else:
+            download_streamed('{}/{}'.format(url, filename), path, connection_pool)
+
+    with ThreadPoolExecutor(workers_count) as executor:
+        list(executor.map(download, filenames))
+
+    # ru_maxrss is in KB on Linux
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.streaming_rss', description='Peak RSS downloading and decompressing big LZMA CSV files, buffered against streamed')
+    parser.add_argument('-n', '--files', type=int, default=10, help='files to download, defaults to 10')
+    parser.add_argument('-s', '--size', type=int, default=32, help='decompressed size of each file in MB, defaults to 32')
+    parser.add_argument('-w', '--workers', type=int, default=10, help='workers count, defaults to 10')
+    parser.add_argument('--run', nargs=4, metavar=('MODE', 'URL', 'FILES', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Each mode runs in its own process so one peak doesn't hide the other
+    if args.run:
+        mode, url, filenames, output_dir = args.run
+        return run(mode, url, filenames.split(','), output_dir, args.workers)
+
+    with tempfile.TemporaryDirectory() as root:
+        served_dir = os.path.join(root, 'served')
+        os.makedirs(served_dir)
+
+        blob = lzma_blob(csv_like(args.size * 1024 * 1024))
+        filenames = ['file_{}.csv'.format(index) for index in range(args.files)]
+
+        for filename in filenames:
+            with open(os.path.join(served_dir, filename), 'wb') as f:
+                f.write(blob)
+
+        server, url = start_server(served_dir)
+
+        print('{} files of {:.1f} MB compressed, {} MB decompressed, {} workers'.format(args.files, len(blob) / 1024 / 1024, args.size, args.workers))
+
+        for mode in ('buffered', 'streamed'):
+            output_dir = os.path.join(root, mode)
+            os.makedirs(output_dir)
+
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.streaming_rss', '-w', str(args.workers),
+                                     '--run', mode, url, ','.join(filenames), output_dir],
+                                    check=True, capture_output=True, text=True).stdout
+
+            print('{:9} peak RSS {:6.1f} MB'.format(mode, int(output) / 1024))
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
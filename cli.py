@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from datetime import datetime
+from urllib.error import HTTPError
+
+from lib.blob_store import BlobStore
+from lib.downloader import Downloader, fetch_fingerprint
+from lib.batch_downloader import BatchDownloader
+from lib.verify import OK, UNVERIFIED, verify_tree
+from lib.version_discovery import discover_version
+from lib.fingerprint_diff import diff_fingerprints, changed_files, write_diff_report, load_patch_fingerprint
+from lib.assets_info_cache import AssetsInfoCache
+from lib.utils import normalize_extensions, is_fingerprint_valid, is_masterhash_valid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Download Clash Royale assets without the GUI')
+
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('-m', '--masterhash', help='download this patch instead of the latest one')
+    source.add_argument('-f', '--fingerprint', help='download the patch described by this fingerprint file')
+    source.add_argument('-b', '--batch', nargs='+', metavar='PATCH', help='download several patches, given by masterhash or fingerprint file, together with files they share downloaded only once')
+
+    parser.add_argument('--diff', metavar='FROM', help='only download files added or modified since this masterhash or fingerprint file, and write the diff report in the patch folder')
+    parser.add_argument('-e', '--extensions', nargs='+', help='only download files with these extensions, e.g. .csv .sc')
+    parser.add_argument('-p', '--priority', nargs='+', help='download files with these extensions first, e.g. .csv .sc, defaults to priority_extensions from the config')
+    parser.add_argument('-o', '--output', help='output folder, defaults to output_path from the config')
+    parser.add_argument('-w', '--workers', type=int, help='workers count, defaults to workers_count from the config')
+    parser.add_argument('--timeout', type=int, help='seconds before a stalled request is given up, defaults to request_timeout from the config')
+    parser.add_argument('--retries', type=int, help='attempts per file after the first one fails, defaults to max_retries from the config')
+    parser.add_argument('--limit-rate', type=int, help='download speed limit in KB/s, 0 for unlimited, defaults to max_download_speed from the config')
+    parser.add_argument('--limit-requests', type=int, help='requests per second limit, 0 for unlimited, defaults to max_requests_per_second from the config')
+    parser.add_argument('--auto', action='store_true', help='adjust the workers count during the download, up to the given workers count')
+    parser.add_argument('--engine', choices=['Threads', 'Asyncio'], help='download engine, defaults to download_engine from the config')
+    parser.add_argument('-d', '--decompress', action='store_true', help='decompress CSV / SC files')
+    parser.add_argument('-i', '--incremental', action='store_true', help='reuse files from previously downloaded patches')
+    parser.add_argument('--overwrite', action='store_true', help='download again files that already exist')
+    parser.add_argument('--verify', nargs='?', const='', metavar='PATH', help='check downloaded files against their fingerprint sha instead of downloading, in the given patch or output folder, defaults to output_path from the config')
+    parser.add_argument('-s', '--store', action='store_true', help='store files shared by several patches only once and hardlink them into each patch folder')
+    parser.add_argument('--gc', nargs='?', const='', metavar='PATH', help='delete stored files no patch uses anymore instead of downloading, in the given output folder, defaults to output_path from the config')
+    parser.add_argument('--metrics-textfile', metavar='PATH', help='also write the run metrics to this Prometheus textfile, defaults to metrics_textfile from the config')
+    parser.add_argument('--refresh', action='store_true', help='ignore the cached assets host & fingerprint')
+    parser.add_argument('-c', '--config', default='config.json', help='config file, defaults to config.json')
+
+    return parser.parse_args()
+
+
+def exit_with_error(message):
+    print('Error: {}'.format(message), file=sys.stderr)
+    sys.exit(1)
+
+
+def load_fingerprint(fingerprint_path):
+    try:
+        with open(fingerprint_path) as f:
+            fingerprint = json.load(f)
+
+    except OSError:
+        exit_with_error('cannot retrieve fingerprint {}'.format(fingerprint_path))
+
+    except json.decoder.JSONDecodeError:
+        exit_with_error('couldn\'t parse the given fingerprint')
+
+    if not is_fingerprint_valid(fingerprint):
+        exit_with_error('the given fingerprint is missing needed fields')
+
+    return fingerprint
+
+
+def verify(path, workers_count):
+    results = verify_tree(path, workers_count)
+
+    if not results:
+        exit_with_error('no downloaded patch found in {}'.format(path))
+
+    failed = False
+
+    for patch_dir, statuses in results.items():
+        counts = {}
+
+        for filename, status in statuses:
+            counts[status] = counts.get(status, 0) + 1
+
+            if status not in (OK, UNVERIFIED):
+                print('{}: {}'.format(status, os.path.join(patch_dir, filename)), file=sys.stderr)
+                failed = True
+
+        print('{}: {}'.format(os.path.basename(patch_dir), ', '.join('{} {}'.format(count, status) for status, count in sorted(counts.items()))))
+
+    if failed:
+        exit_with_error('some files are missing or corrupt, they will be downloaded again with their patch')
+
+
+def main():
+    args = parse_args()
+
+    if not os.path.isfile(args.config):
+        exit_with_error('{} file is missing, cannot continue'.format(args.config))
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    if args.verify is not None:
+        return verify(os.path.abspath(args.verify or config['output_path']), args.workers)
+
+    if args.gc is not None:
+        deleted_blobs, freed_bytes = BlobStore(os.path.abspath(args.gc or config['output_path'])).collect_garbage()
+
+        return print('{} unused stored files deleted, {:.2f} MB freed'.format(deleted_blobs, freed_bytes / 1024 / 1024))
+
+    if args.masterhash and not is_masterhash_valid(args.masterhash):
+        exit_with_error('invalid masterhash')
+
+    if args.diff and not os.path.isfile(args.diff) and not is_masterhash_valid(args.diff):
+        exit_with_error('--diff expects a masterhash or a fingerprint file')
+
+    if args.batch and args.diff:
+        exit_with_error('--diff cannot be used with --batch')
+
+    for patch in args.batch or []:
+        if not os.path.isfile(patch) and not is_masterhash_valid(patch):
+            exit_with_error('--batch expects masterhashes or fingerprint files, got {}'.format(patch))
+
+    assets_info_cache = AssetsInfoCache('assets_info_cache.json', config.get('assets_info_ttl', 300))
+
+    if args.refresh:
+        assets_info_cache.invalidate()
+
+    print('Fetching assets host & fingerprint from supercell servers')
+
+    login_failed_error_code, assets_hosts, latest_fingerprint = assets_info_cache.fetch(config['major'], config['build'])
+
+    if login_failed_error_code == 8:
+        print('Build and major from config are outdated, there was probably a game update, looking for the new ones')
+
+        config['major'], config['build'] = discover_version(config['major'], config['build'])
+        config['version_found_at'] = datetime.utcnow().isoformat()
+
+        with open(args.config, 'w') as f:
+            f.write(json.dumps(config, indent=4))
+
+        print('New major version: {}, new build version: {}'.format(config['major'], config['build']))
+
+        login_failed_error_code, assets_hosts, latest_fingerprint = assets_info_cache.fetch(config['major'], config['build'])
+
+    if login_failed_error_code == 8:
+        exit_with_error('build and major from config are outdated, there was probably a game update')
+
+    elif login_failed_error_code == 10:
+        exit_with_error('server is in maintenance, cannot fetch current info')
+
+    elif login_failed_error_code != 7:
+        exit_with_error('wrong login failed code: {}'.format(login_failed_error_code))
+
+    if not assets_hosts:
+        exit_with_error('couldn\'t find any host to download assets')
+
+    if args.batch:
+        fingerprints = []
+
+        for patch in args.batch:
+            if os.path.isfile(patch):
+                fingerprints.append(load_fingerprint(patch))
+
+            else:
+                try:
+                    fingerprints.append(fetch_fingerprint(assets_hosts, patch))
+
+                except HTTPError:
+                    exit_with_error('couldn\'t fetch any fingerprint for masterhash {}'.format(patch))
+
+        fingerprint = fingerprints[0]
+
+    elif args.fingerprint:
+        fingerprint = load_fingerprint(args.fingerprint)
+
+    elif args.masterhash:
+        try:
+            fingerprint = fetch_fingerprint(assets_hosts, args.masterhash)
+
+        except HTTPError:
+            exit_with_error('couldn\'t fetch any fingerprint for this masterhash')
+
+    else:
+        fingerprint = json.loads(latest_fingerprint)
+
+    output_path = os.path.abspath(args.output or config['output_path'])
+
+    if args.diff:
+        if os.path.isfile(args.diff):
+            old_fingerprint = load_fingerprint(args.diff)
+
+        else:
+            try:
+                old_fingerprint = load_patch_fingerprint(output_path, assets_hosts, args.diff)
+
+            except HTTPError:
+                exit_with_error('couldn\'t fetch any fingerprint for the masterhash to diff with')
+
+        diff = diff_fingerprints(old_fingerprint, fingerprint)
+        wanted_files = changed_files(diff)
+
+        print('Changes since {}: {} added, {} modified, {} removed, report written to {}'.format(diff['from'], len(diff['added']), len(diff['modified']), len(diff['removed']),
+                                                                                                write_diff_report(os.path.join(output_path, fingerprint['sha']), diff)))
+
+    else:
+        wanted_files = None
+
+    if args.extensions:
+        wanted_extensions = normalize_extensions(args.extensions)
+
+    else:
+        wanted_extensions = None
+
+    priority_extensions = normalize_extensions(args.priority or config.get('priority_extensions', []))
+
+    engine = args.engine or config.get('download_engine', 'Threads')
+
+    if args.workers:
+        workers_count = args.workers
+
+    elif engine == 'Asyncio':
+        workers_count = config.get('async_concurrency', 100)
+
+    else:
+        workers_count = config['workers_count']
+
+    options = dict(wanted_extensions=wanted_extensions,
+                   workers_count=workers_count,
+                   engine=engine,
+                   decompress_data=args.decompress,
+                   incremental=args.incremental,
+                   overwrite=args.overwrite,
+                   priority_extensions=priority_extensions,
+                   request_timeout=args.timeout or config.get('request_timeout', 30),
+                   max_retries=config.get('max_retries', 3) if args.retries is None else args.retries,
+                   max_bandwidth=(config.get('max_download_speed', 0) if args.limit_rate is None else args.limit_rate) * 1024,
+                   max_requests=config.get('max_requests_per_second', 0) if args.limit_requests is None else args.limit_requests,
+                   auto_workers=args.auto or config.get('auto_workers', False),
+                   deduplicate=args.store or config.get('deduplicate_files', False),
+                   wanted_files=wanted_files,
+                   metrics_textfile=args.metrics_textfile or config.get('metrics_textfile') or None)
+
+    if args.batch:
+        downloader = BatchDownloader(fingerprints, assets_hosts, output_path, **options)
+
+    else:
+        downloader = Downloader(fingerprint, assets_hosts, output_path, **options)
+
+    def print_progress(filename):
+        print('[{}/{}] {}'.format(downloader.downloaded_files, downloader.total_files, filename), flush=True)
+
+    downloader.on_file_downloaded = print_progress
+
+    downloader.prepare()
+
+    if args.batch:
+        print('Downloading {} patches with {} workers, {} files queued for {} patch files, {} reused from previous patches'.format(
+            len(downloader.jobs), workers_count, downloader.total_files, sum(job.total_files for job in downloader.jobs), downloader.reused_files), flush=True)
+
+    else:
+        print('Downloading patch {} (version {}) with {} workers, {} files queued, {} reused from previous patches'.format(
+            downloader.masterhash, fingerprint.get('version'), workers_count, downloader.total_files, downloader.reused_files), flush=True)
+
+    start_time = time.monotonic()
+
+    try:
+        downloader.run()
+
+    except KeyboardInterrupt:
+        downloader.stop()
+        exit_with_error('download interrupted, run the same command again to resume it')
+
+    elapsed_time = int(time.monotonic() - start_time)
+
+    print('Download finished ! {} files downloaded in {}min {}s ({})'.format(downloader.downloaded_files,
+                                                                            *divmod(elapsed_time, 60),
+                                                                            downloader.stats_summary()))
+
+    if args.batch:
+        for job in downloader.jobs:
+            print('Patch {} (version {}): {}/{} files'.format(job.masterhash, job.fingerprint.get('version'), job.downloaded_files, job.total_files))
+
+    if downloader.failed_files:
+        for filename, error in downloader.failed_files:
+            print('Failed: {} ({})'.format(filename, error), file=sys.stderr)
+
+        exit_with_error('{} files couldn\'t be downloaded, run the same command again to retry them'.format(len(downloader.failed_files)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import json
+import time
+
+from lib.protocol import request_login_failed, read_assets_info
+
+
+class AssetsInfoCache:
+
+    def __init__(self, path, ttl=300):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, major, build):
+        entry = self.entries.get('{}.{}'.format(major, build))
+
+        if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+            return entry['assets_hosts'], entry['fingerprint']
+
+    def set(self, major, build, assets_hosts, fingerprint):
+        now = time.time()
+
+        self.entries = {key: entry for key, entry in self.entries.items() if now - entry['fetched_at'] < self.ttl}
+        self.entries['{}.{}'.format(major, build)] = {'fetched_at': now, 'assets_hosts': assets_hosts, 'fingerprint': fingerprint}
+
+        self.save()
+
+    def invalidate(self):
+        self.entries = {}
+
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f)
+
+        os.replace(self.path + '.tmp', self.path)
+
+    def fetch(self, major, build):
+        # Returns the login failed error code along with the assets hosts and the decompressed fingerprint when it is 7
+        cached = self.get(major, build)
+
+        if cached is not None:
+            return (7,) + cached
+
+        login_failed = request_login_failed(major, build)
+        login_failed_error_code = login_failed.read_vint()
+
+        if login_failed_error_code != 7:
+            return login_failed_error_code, None, None
+
+        assets_hosts, fingerprint = read_assets_info(login_failed)
+
+        self.set(major, build, assets_hosts, fingerprint)
+
+        return login_failed_error_code, assets_hosts, fingerprint
@@ -0,0 +1,96 @@
+import time
+import asyncio
+import aiohttp
+
+from lib.metrics import FIRST_BYTE
+from lib.retry_policy import FileAttempts
+from lib.transfer import CHUNK_SIZE, PartFile, save_download
+
+
+class AsyncEngine:
+
+    def __init__(self, downloader):
+        self.downloader = downloader
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+
+        try:
+            loop.run_until_complete(self.download_all(self.downloader.workers_count))
+
+        finally:
+            loop.close()
+
+    async def download_all(self, concurrency):
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.downloader.request_timeout, sock_read=self.downloader.request_timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await asyncio.gather(*(self.worker(session) for _ in range(concurrency)))
+
+    async def worker(self, session):
+        downloader = self.downloader
+
+        while downloader.is_running:
+            # Polling keeps the event loop free while the concurrency controller has fewer slots than there are workers
+            if not downloader.concurrency_controller.try_acquire():
+                await asyncio.sleep(0.05)
+                continue
+
+            try:
+                filename = downloader.next_file()
+
+                if filename is None:
+                    return
+
+                await self.process(session, filename)
+
+            finally:
+                downloader.concurrency_controller.release()
+
+    async def process(self, session, filename):
+        loop = asyncio.get_running_loop()
+        downloader = self.downloader
+        path = downloader.file_path(filename)
+
+        downloader.on_file_started(filename)
+
+        try:
+            part_path = await self.download(session, filename, path)
+
+            # Submitting blocks while the decompression stage is full, keep that wait off the loop
+            await loop.run_in_executor(None, save_download, downloader, filename, part_path, path)
+
+        except Exception as error:
+            downloader.on_file_saved(filename, error)
+
+    async def download(self, session, filename, path):
+        downloader = self.downloader
+        attempts = FileAttempts(downloader, filename)
+
+        while True:
+            host, delay = attempts.next_host()
+            await asyncio.sleep(delay)
+
+            start_time = time.monotonic()
+
+            try:
+                async with session.get(downloader.file_url(host, filename)) as response:
+                    downloader.metrics.observe(FIRST_BYTE, time.monotonic() - start_time)
+                    response.raise_for_status()
+
+                    # Chunk writes land in the page cache and are cheap enough to do on the loop
+                    with PartFile(path, downloader.bandwidth_limiter, downloader.metrics) as part_file:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            await asyncio.sleep(part_file.write(chunk))
+
+            except aiohttp.ClientResponseError as error:
+                attempts.failed(error, error.status)
+                continue
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                attempts.failed(error)
+                continue
+
+            if attempts.succeeded(*part_file.result()):
+                return part_file.path
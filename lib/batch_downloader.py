@@ -0,0 +1,122 @@
+import os
+
+from lib.utils import join_path
+from lib.size_index import SizeIndex
+from lib.downloader import Downloader
+from lib.sha_index import link_file
+
+
+class BatchDownloader(Downloader):
+
+    def __init__(self, fingerprints, assets_hosts, output_path, *args, **kwargs):
+        on_file_downloaded = kwargs.pop('on_file_downloaded', None)
+        on_file_failed = kwargs.pop('on_file_failed', None)
+
+        # Diff mode picks files of a single patch, it has no meaning for a batch
+        kwargs.pop('wanted_files', None)
+
+        # The batch has no patch of its own, its queue only holds the files of its jobs
+        Downloader.__init__(self, {'sha': '', 'files': []}, assets_hosts, output_path, *args,
+                            on_file_downloaded=on_file_downloaded, on_file_failed=on_file_failed, **kwargs)
+
+        self.patch_dir = output_path
+
+        # One job per patch, they keep their own journal and counters but never download anything themselves
+        self.jobs = [Downloader(fingerprint, assets_hosts, output_path, *args, **kwargs) for fingerprint in fingerprints]
+
+        # Blob key -> every (job, filename) waiting for that content, the first one is where it gets downloaded
+        self.targets = {}
+
+    def prepare(self):
+        queued_files = []
+
+        for job in self.jobs:
+            job_files = job.prepare_files()
+            job.total_files = len(job_files)
+
+            self.reused_files += job.reused_files
+
+            for filename, sha in job_files:
+                # Files without sha (fingerprint.json) are never shared
+                key = self.blob_key(filename, sha) if sha is not None else join_path(job.masterhash, filename)
+
+                if key not in self.targets:
+                    self.targets[key] = []
+                    self.file_shas[key] = sha
+
+                    queued_files.append((filename, sha, key))
+
+                self.targets[key].append((job, filename))
+
+        self.size_index = SizeIndex(self.output_path)
+        self.size_index.learn_extensions([(file['file'], file.get('sha')) for job in self.jobs for file in job.fingerprint_index.files])
+
+        for index, (filename, sha, key) in enumerate(queued_files):
+            self.download_queue.put(self.priority(filename, sha) + (index, key))
+
+        self.total_files = self.download_queue.qsize()
+
+        self.prepare_pipeline()
+
+    def finish(self):
+        for job in self.jobs:
+            job.journal.close()
+
+        self.size_index.save()
+
+    def file_path(self, key):
+        job, filename = self.targets[key][0]
+
+        return job.file_path(filename)
+
+    def file_url(self, host, key):
+        job, filename = self.targets[key][0]
+
+        return job.file_url(host, filename)
+
+    def on_file_started(self, key):
+        for job, filename in self.targets[key]:
+            job.on_file_started(filename)
+
+    def on_file_saved(self, key, error=None):
+        (source_job, source_filename), *copies = self.targets[key]
+
+        if error is None:
+            source_path = source_job.file_path(source_filename)
+
+            # Linked before the source job stores it, without hardlinks the blob store would turn it into a symlink
+            for job, filename in copies:
+                path = job.file_path(filename)
+
+                try:
+                    if os.path.lexists(path):
+                        os.remove(path)
+
+                    link_file(source_path, path)
+
+                except OSError as link_error:
+                    job.on_file_saved(filename, link_error)
+
+                else:
+                    job.on_file_saved(filename)
+
+            source_job.on_file_saved(source_filename)
+
+        else:
+            for job, filename in self.targets[key]:
+                job.on_file_saved(filename, error)
+
+        filename = join_path(source_job.masterhash, source_filename)
+
+        with self.lock:
+            if error is None:
+                self.downloaded_files += 1
+
+            else:
+                self.failed_files.append((filename, error))
+
+        if error is None and self.on_file_downloaded is not None:
+            self.on_file_downloaded(filename)
+
+        elif error is not None and self.on_file_failed is not None:
+            self.on_file_failed(filename, error)
@@ -0,0 +1,159 @@
+import os
+import json
+import filecmp
+
+from lib.utils import join_path
+from lib.sha_index import StorageModes
+from lib.transfer import needs_decompression
+
+
+BLOBS_DIRNAME = '.blobs'
+
+
+class BlobStore:
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.path = join_path(output_path, BLOBS_DIRNAME)
+
+    @staticmethod
+    def key(filename, sha, decompressed):
+        # Decompressed CSV / SC files don't have the content of their sha, they get their own blob
+        return sha + '.decompressed' if needs_decompression(filename, decompressed) else sha
+
+    def blob_path(self, key):
+        return join_path(self.path, key[:2], key)
+
+    def has(self, key):
+        return os.path.isfile(self.blob_path(key))
+
+    def link(self, key, path):
+        temporary_path = path + '.link'
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            os.link(self.blob_path(key), temporary_path)
+
+        except OSError:
+            os.symlink(self.blob_path(key), temporary_path)
+
+        os.replace(temporary_path, path)
+
+    def store(self, path, key):
+        blob_path = self.blob_path(key)
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        try:
+            os.link(path, blob_path)
+
+            return
+
+        except FileExistsError:
+            # Already linked to the blob, like the copies of a file shared by the patches of a batch
+            if os.path.samefile(path, blob_path):
+                return
+
+        except OSError:
+            # No hardlinks on this filesystem, the blob takes the file and the patch gets a symlink
+            pass
+
+        # The file was just downloaded and checked, a stored blob with other content got corrupted and is replaced.
+        # Otherwise the same content is already stored, share its blob instead.
+        if not os.path.isfile(blob_path) or not filecmp.cmp(path, blob_path, shallow=False):
+            os.replace(path, blob_path)
+
+        self.link(key, path)
+
+    def discard(self, path, key):
+        # A corrupt file linked to its blob means the blob is corrupt too, no patch must be linked to it anymore
+        blob_path = self.blob_path(key)
+
+        if os.path.isfile(path) and os.path.isfile(blob_path) and os.path.samefile(path, blob_path):
+            os.remove(blob_path)
+
+    def blob_inodes(self):
+        inodes = {}
+
+        for directory in os.scandir(self.path):
+            for blob in os.scandir(directory.path):
+                stat = blob.stat()
+                inodes[stat.st_dev, stat.st_ino] = blob.name
+
+        return inodes
+
+    def linked_keys(self, patch_dir, blob_inodes):
+        # Without a fingerprint there is no telling which files belong to the patch, keep every blob one of them links to
+        keys = set()
+
+        for root, _, filenames in os.walk(patch_dir):
+            for filename in filenames:
+                path = join_path(root, filename)
+
+                if os.path.islink(path):
+                    keys.add(os.path.basename(os.readlink(path)))
+                    continue
+
+                stat = os.lstat(path)
+                key = blob_inodes.get((stat.st_dev, stat.st_ino))
+
+                if key is not None:
+                    keys.add(key)
+
+        return keys
+
+    def referenced_keys(self, blob_inodes):
+        keys = set()
+
+        for entry in os.scandir(self.output_path):
+            if not entry.is_dir() or entry.name == BLOBS_DIRNAME:
+                continue
+
+            try:
+                with open(join_path(entry.path, 'fingerprint.json')) as f:
+                    fingerprint = json.load(f)
+
+            except (OSError, ValueError):
+                keys |= self.linked_keys(entry.path, blob_inodes)
+                continue
+
+            storage_modes = StorageModes(entry.path)
+
+            for file in fingerprint.get('files', []):
+                if 'sha' not in file or not os.path.lexists(join_path(entry.path, file['file'])):
+                    continue
+
+                decompressed = storage_modes.stored(file['file'])
+
+                # Being downloaded again the other way, the file on disk may use either blob
+                if decompressed is None:
+                    keys.add(self.key(file['file'], file['sha'], True))
+                    keys.add(self.key(file['file'], file['sha'], False))
+
+                else:
+                    keys.add(self.key(file['file'], file['sha'], decompressed))
+
+        return keys
+
+    def collect_garbage(self):
+        # Deletes the blobs no patch folder uses anymore, returns how many were deleted and the bytes freed
+        if not os.path.isdir(self.path):
+            return 0, 0
+
+        keys = self.referenced_keys(self.blob_inodes())
+
+        deleted_blobs = 0
+        freed_bytes = 0
+
+        for directory in os.scandir(self.path):
+            for blob in os.scandir(directory.path):
+                if blob.name in keys:
+                    continue
+
+                freed_bytes += blob.stat().st_size
+                deleted_blobs += 1
+
+                os.remove(blob.path)
+
+        return deleted_blobs, freed_bytes
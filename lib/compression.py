@@ -1,27 +1,239 @@
 import lzma
 import lzham
 
+try:
+    import zstandard
 
-def decompress(data):
-    if data[:2] == b'SC':  # Supercell header
-        hash_length = int.from_bytes(data[6:10], 'big')
-        data = data[10 + hash_length:]
+except ImportError:
+    zstandard = None
+
+
+SC_MAGIC = b'SC'
+
+
+class DecompressionError(Exception):
+    pass
+
+
+class DecompressionResult:
+
+    def __init__(self, format, sc_version, compressed_size, decompressed_size=0, data=None, error=None):
+        self.format = format
+        self.sc_version = sc_version
+        self.compressed_size = compressed_size
+        self.decompressed_size = decompressed_size
+        self.data = data
+        self.error = error
+
+    @property
+    def success(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<DecompressionResult {}{} {} -> {} bytes{}>'.format('sc v{} '.format(self.sc_version) if self.sc_version is not None else '',
+                                                                    self.format,
+                                                                    self.compressed_size,
+                                                                    self.decompressed_size,
+                                                                    ', error: {}'.format(self.error) if self.error else '')
+
+
+def read_sc_header(header):
+    # Returns the Supercell header version and length, or None and 0 when there is no such header
+    if header[:2] != SC_MAGIC or len(header) < 10:
+        return None, 0
+
+    version = int.from_bytes(header[2:6], 'big')
+    offset = 6
+
+    # Version 4 headers repeat the version before the hash
+    if version == 4:
+        offset += 4
+
+    hash_length = int.from_bytes(header[offset:offset + 4], 'big')
+
+    return version, offset + 4 + hash_length
+
+
+class Codec:
+
+    name = None
+    magic = None
+
+    def matches(self, data):
+        return data[:len(self.magic)] == self.magic
 
-    if data[:4] == b'SCLZ':  # LZHAM compression
-        dict_size = int.from_bytes(data[4:5], 'big')
+    def decompress(self, data):
+        raise NotImplementedError
+
+    def decompress_stream(self, source, destination, chunk_size):
+        # Codecs that can only decode whole buffers read everything left in source at once
+        return destination.write(self.decompress(memoryview(source.read())))
+
+
+class SclzCodec(Codec):
+
+    name = 'sclz'
+    magic = b'SCLZ'
+
+    def decompress(self, data):
+        dict_size = data[4]
         uncompressed_size = int.from_bytes(data[5:9], 'little')
 
-        try:
-            return lzham.decompress(data[9:], uncompressed_size, {'dict_size_log2': dict_size})
+        # pylzham only accepts bytes, this is the one copy left
+        return lzham.decompress(data[9:].tobytes(), uncompressed_size, {'dict_size_log2': dict_size})
+
+
+class LzmaCodec(Codec):
+
+    name = 'lzma'
+
+    # lc=3, lp=0, pb=2, the properties byte every LZMA compressed game file starts with
+    magic = b'\x5d'
+
+    # Smallest dictionary the LZMA tools write
+    MIN_DICT_SIZE = 4096
+
+    def matches(self, data):
+        # One byte alone would take text starting with ']' for LZMA, the dictionary size after it has to be one the
+        # LZMA tools write too: 2^n or 2^n + 2^(n-1) bytes
+        if len(data) < 5 or data[:1] != self.magic:
+            return False
+
+        dict_size = int.from_bytes(data[1:5], 'little')
+        power = 1 << (dict_size.bit_length() - 1) if dict_size else 0
+
+        return dict_size >= self.MIN_DICT_SIZE and dict_size in (power, power | power >> 1)
+
+    def decompress(self, data):
+        decompressor = lzma.LZMADecompressor()
+
+        # The header lacks 4 bytes of the uncompressed size, feed them before the body instead of rebuilding the whole buffer
+        decompressed = decompressor.decompress(data[:9].tobytes() + bytes(4)) + decompressor.decompress(data[9:])
+
+        if not decompressor.eof:
+            raise DecompressionError('truncated LZMA stream')
+
+        return decompressed
+
+    def decompress_stream(self, source, destination, chunk_size):
+        decompressor = lzma.LZMADecompressor()
+
+        size = destination.write(decompressor.decompress(source.read(9) + bytes(4)))
 
-        except:
-            return data
+        while not decompressor.eof:
+            chunk = source.read(chunk_size)
 
-    else:  # LZMA compression
-        adjusted_data = data[0:9] + bytes(4) + data[9:]
+            if not chunk:
+                raise DecompressionError('truncated LZMA stream')
+
+            size += destination.write(decompressor.decompress(chunk))
+
+        return size
+
+
+class ZstdCodec(Codec):
+
+    name = 'zstd'
+    magic = b'\x28\xb5\x2f\xfd'
+
+    def iter_decompress(self, chunks):
+        if zstandard is None:
+            raise DecompressionError('the zstandard module is needed to decompress this file')
+
+        context = zstandard.ZstdDecompressor()
+        decompressor = context.decompressobj()
+
+        frame_started = False
+
+        for chunk in chunks:
+            while chunk:
+                yield decompressor.decompress(chunk)
+                frame_started = True
+
+                # A decompressor only handles one frame, start a new one for whatever follows it
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = context.decompressobj()
+                    frame_started = False
+
+                else:
+                    chunk = None
+
+        if frame_started:
+            raise DecompressionError('truncated Zstandard frame')
+
+    def decompress(self, data):
+        return b''.join(self.iter_decompress([data]))
+
+    def decompress_stream(self, source, destination, chunk_size):
+        return sum(destination.write(chunk) for chunk in self.iter_decompress(iter(lambda: source.read(chunk_size), b'')))
+
+
+CODECS = []
+
+
+def register_codec(codec):
+    CODECS.append(codec)
+
+
+register_codec(SclzCodec())
+register_codec(LzmaCodec())
+register_codec(ZstdCodec())
+
+
+def detect_codec(data):
+    for codec in CODECS:
+        if codec.matches(data):
+            return codec
+
+
+def decompress(data):
+    # Header fields and the payload are read through a memoryview so no slice copies the payload
+    data = memoryview(data)
+    compressed_size = len(data)
+
+    sc_version, header_length = read_sc_header(data[:14])
+    data = data[header_length:]
+
+    codec = detect_codec(data)
+    format = codec.name if codec is not None else 'raw'
+
+    try:
+        if codec is not None:
+            decompressed = codec.decompress(data)
+
+        elif sc_version is None:
+            decompressed = data.tobytes()
+
+        else:
+            raise DecompressionError('unsupported data after the SC header')
+
+    except Exception as error:
+        return DecompressionResult(format, sc_version, compressed_size, error=error)
+
+    return DecompressionResult(format, sc_version, compressed_size, len(decompressed), decompressed)
+
+
+def decompress_file(source_path, destination_path, chunk_size=64 * 1024):
+    with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+        compressed_size = source.seek(0, 2)
+
+        source.seek(0)
+        sc_version, header_length = read_sc_header(source.read(14))
+
+        source.seek(header_length)
+        codec = detect_codec(source.read(9))
+        source.seek(header_length)
+
+        format = codec.name if codec is not None else 'raw'
 
         try:
-            return lzma.LZMADecompressor().decompress(adjusted_data)
+            if codec is None:
+                raise DecompressionError('unsupported {} data'.format(format))
+
+            decompressed_size = codec.decompress_stream(source, destination, chunk_size)
+
+        except Exception as error:
+            return DecompressionResult(format, sc_version, compressed_size, error=error)
 
-        except:
-            return data
+    return DecompressionResult(format, sc_version, compressed_size, decompressed_size)
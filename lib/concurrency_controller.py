@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+
+from lib.utils import join_path
+
+
+CONCURRENCY_LOG_FILENAME = '.concurrency.csv'
+
+
+class ConcurrencyController(threading.Thread):
+
+    # Auto mode starts low, doubles the workers until throughput stops improving, then grows them one by one
+    INITIAL_LIMIT = 4
+    INTERVAL = 1.0
+
+    # Throughput has to grow by this much for another worker to be worth it
+    MIN_GAIN = 1.05
+
+    def __init__(self, downloader, max_limit, auto=False):
+        self.downloader = downloader
+        self.max_limit = max_limit
+        self.auto = auto
+
+        self.limit = min(self.INITIAL_LIMIT, max_limit) if auto else max_limit
+        self.active = 0
+        self.condition = threading.Condition()
+
+        self.slow_start = auto
+        self.finished = threading.Event()
+        self.history = []
+
+        threading.Thread.__init__(self, daemon=True)
+
+    def try_acquire(self):
+        with self.condition:
+            if self.active >= self.limit or not self.downloader.is_running:
+                return False
+
+            self.active += 1
+
+            return True
+
+    def acquire(self):
+        with self.condition:
+            # Wakes up regularly so a stopped download doesn't leave workers waiting for a slot
+            while self.active >= self.limit and self.downloader.is_running:
+                self.condition.wait(self.INTERVAL)
+
+            # No slot for a download stopped while waiting, the worker must not start another file
+            if not self.downloader.is_running:
+                return False
+
+            self.active += 1
+
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def set_limit(self, limit):
+        with self.condition:
+            self.limit = max(1, min(limit, self.max_limit))
+            self.condition.notify_all()
+
+    def errors_count(self):
+        return sum(stats.errors for stats in self.downloader.host_scheduler.hosts)
+
+    def run(self):
+        downloader = self.downloader
+
+        start_time = time.monotonic()
+        last_bytes, last_errors = downloader.metrics.received_bytes, self.errors_count()
+        last_throughput = 0
+
+        while not self.finished.wait(self.INTERVAL):
+            received_bytes, errors = downloader.metrics.received_bytes, self.errors_count()
+            throughput = (received_bytes - last_bytes) / self.INTERVAL
+
+            self.history.append((time.monotonic() - start_time, self.limit, throughput, errors - last_errors))
+
+            # AIMD: failures mean the hosts or the link are overloaded, halve the workers.
+            # Otherwise add more workers as long as it still pays off.
+            if errors > last_errors:
+                self.slow_start = False
+                self.set_limit(self.limit // 2)
+
+            # Nothing arrived, connections are still opening or stalled, there is no measure to act on
+            elif not throughput:
+                continue
+
+            elif throughput >= last_throughput * self.MIN_GAIN:
+                self.set_limit(self.limit * 2 if self.slow_start else self.limit + 1)
+
+            else:
+                self.slow_start = False
+
+            last_bytes, last_errors = received_bytes, errors
+            last_throughput = throughput
+
+    def stop(self):
+        self.finished.set()
+
+    def save_log(self):
+        os.makedirs(self.downloader.patch_dir, exist_ok=True)
+
+        with open(join_path(self.downloader.patch_dir, CONCURRENCY_LOG_FILENAME), 'w') as f:
+            f.write('elapsed_time,workers,bytes_per_second,errors\n')
+
+            for elapsed_time, limit, throughput, errors in self.history:
+                f.write('{:.1f},{},{:.0f},{}\n'.format(elapsed_time, limit, throughput, errors))
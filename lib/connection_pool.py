@@ -0,0 +1,88 @@
+import threading
+
+from contextlib import contextmanager
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+
+
+class ConnectionPool:
+
+    def __init__(self, max_idle_per_host=10, timeout=30):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+
+        self.idle_connections = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, scheme, host):
+        with self.lock:
+            idle = self.idle_connections.get((scheme, host))
+
+            if idle:
+                return idle.pop(), True
+
+        if scheme == 'https':
+            return HTTPSConnection(host, timeout=self.timeout), False
+
+        return HTTPConnection(host, timeout=self.timeout), False
+
+    def release(self, scheme, host, connection):
+        with self.lock:
+            idle = self.idle_connections.setdefault((scheme, host), [])
+
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    @contextmanager
+    def open(self, url):
+        url_parts = urlsplit(url)
+
+        scheme, host = url_parts.scheme, url_parts.netloc
+        path = url_parts.path + ('?' + url_parts.query if url_parts.query else '')
+
+        while True:
+            connection, reused = self.acquire(scheme, host)
+
+            try:
+                connection.request('GET', path, headers={'Connection': 'keep-alive'})
+                response = connection.getresponse()
+                break
+
+            except (ConnectionError, HTTPException):
+                connection.close()
+
+                # A reused connection may have been closed by the server while idle, retry on a fresh one
+                if not reused:
+                    raise
+
+        try:
+            if response.status != 200:
+                response.read()
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+
+            yield response
+
+            # Drain what the caller left so the connection can carry the next request
+            response.read()
+
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+
+        else:
+            self.release(scheme, host, connection)
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle_connections.values():
+                for connection in idle:
+                    connection.close()
+
+            self.idle_connections.clear()
@@ -0,0 +1,60 @@
+import os
+import time
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.metrics import DECOMPRESS
+from lib.transfer import save_file
+from lib.stage_stats import StageStats
+
+
+def decompress_part(part_path, path):
+    start_time = time.monotonic()
+
+    save_file(part_path, path, True)
+
+    return os.path.getsize(path), time.monotonic() - start_time
+
+
+class DecompressionStage:
+
+    def __init__(self, metrics, max_pending=None):
+        workers_count = os.cpu_count() or 1
+
+        self.metrics = metrics
+
+        self.executor = ProcessPoolExecutor(max_workers=workers_count)
+        self.stats = StageStats('decompression', workers_count)
+
+        # Network workers block here once enough downloaded files are waiting to be decompressed
+        self.slots = threading.BoundedSemaphore(max_pending or workers_count * 2)
+
+    def submit(self, part_path, path, callback):
+        self.slots.acquire()
+
+        # A broken pool refuses new work, the slot has to come back or every network worker ends up waiting for it
+        try:
+            future = self.executor.submit(decompress_part, part_path, path)
+
+        except Exception:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(lambda future: self.on_done(future, callback))
+
+    def on_done(self, future, callback):
+        self.slots.release()
+
+        error = future.exception()
+
+        if error is None:
+            size, busy_time = future.result()
+
+            self.stats.record(size, busy_time)
+            self.metrics.observe(DECOMPRESS, busy_time)
+
+        callback(error)
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -0,0 +1,333 @@
+import os
+import json
+import threading
+
+from queue import Empty, PriorityQueue
+from urllib.request import urlopen
+
+from lib.utils import join_path
+from lib.blob_store import BlobStore
+from lib.size_index import SizeIndex
+from lib.fingerprint_index import FingerprintIndex
+from lib.worker import DownloadWorker
+from lib.stage_stats import StageStats
+from lib.host_scheduler import HostScheduler
+from lib.connection_pool import ConnectionPool
+from lib.rate_limiter import TokenBucket
+from lib.retry_policy import RetryPolicy
+from lib.metrics import QUEUE_WAIT, PipelineMetrics, run_summary, write_json_summary, write_prometheus_textfile
+from lib.journal import Journal, QUEUED, IN_FLIGHT, COMPLETE, FAILED
+from lib.decompression_stage import DecompressionStage
+from lib.concurrency_controller import ConcurrencyController
+from lib.sha_index import build_sha_index, link_file
+
+
+# One JSON summary per run so runs can be compared with each other
+METRICS_FILENAME = 'metrics_{}.json'
+
+
+def fetch_fingerprint(assets_hosts, masterhash):
+    for assets_host in assets_hosts[:-1]:
+        try:
+            return json.load(urlopen(join_path(assets_host, masterhash, 'fingerprint.json')))
+
+        except OSError:
+            continue
+
+    return json.load(urlopen(join_path(assets_hosts[-1], masterhash, 'fingerprint.json')))
+
+
+class Downloader:
+
+    def __init__(self, fingerprint, assets_hosts, output_path,
+                 wanted_extensions=None, workers_count=4,
+                 engine='Threads', decompress_data=False,
+                 incremental=False, overwrite=False,
+                 priority_extensions=(), request_timeout=30,
+                 max_retries=3, max_bandwidth=0, max_requests=0,
+                 auto_workers=False, deduplicate=False,
+                 wanted_files=None, on_file_downloaded=None,
+                 on_file_failed=None, metrics_textfile=None):
+
+        self.is_running = True
+
+        self.fingerprint = fingerprint
+        self.fingerprint_index = FingerprintIndex(fingerprint)
+        self.masterhash = fingerprint['sha']
+        self.assets_hosts = assets_hosts
+        self.output_path = output_path
+        self.patch_dir = join_path(output_path, self.masterhash)
+
+        self.engine = engine
+        self.overwrite = overwrite
+        self.incremental = incremental
+        self.auto_workers = auto_workers
+        self.workers_count = workers_count
+        self.request_timeout = request_timeout
+        self.priority_extensions = priority_extensions
+        self.retry_policy = RetryPolicy(max_retries)
+        self.request_limiter = TokenBucket(max_requests)
+        self.bandwidth_limiter = TokenBucket(max_bandwidth)
+        self.decompress_data = decompress_data
+        self.wanted_files = wanted_files
+        self.wanted_extensions = wanted_extensions
+        self.blob_store = BlobStore(output_path) if deduplicate else None
+        self.on_file_failed = on_file_failed
+        self.on_file_downloaded = on_file_downloaded
+        self.metrics_textfile = metrics_textfile
+
+        self.total_files = 0
+        self.reused_files = 0
+        self.downloaded_files = 0
+        self.downloaded_bytes = 0
+        self.failed_files = []
+
+        self.file_shas = {}
+        self.metrics = PipelineMetrics()
+        self.lock = threading.Lock()
+        self.download_queue = PriorityQueue()
+
+    def is_wanted(self, filename):
+        return self.wanted_extensions is None or filename.endswith(self.wanted_extensions)
+
+    def priority(self, filename, sha):
+        extension = os.path.splitext(filename)[1]
+
+        if extension in self.priority_extensions:
+            extension_rank = self.priority_extensions.index(extension)
+
+        else:
+            extension_rank = len(self.priority_extensions)
+
+        # Biggest files first so a huge one doesn't start last and leave a single worker running at the end
+        return extension_rank, -self.size_index.estimate(filename, sha)
+
+    def prepare(self):
+        queued_files = self.prepare_files()
+
+        self.size_index = SizeIndex(self.output_path)
+        self.size_index.learn_extensions([(file['file'], file.get('sha')) for file in self.fingerprint_index.files])
+
+        for index, (filename, sha) in enumerate(queued_files):
+            self.download_queue.put(self.priority(filename, sha) + (index, filename))
+
+        self.total_files = self.download_queue.qsize()
+
+        self.prepare_pipeline()
+
+    def prepare_files(self):
+        # Reuses what is already on disk and returns the (filename, sha) left to download
+        if self.incremental:
+            sha_index = build_sha_index(self.output_path, self.decompress_data, exclude=self.masterhash)
+
+        else:
+            sha_index = {}
+
+        self.journal = Journal(self.patch_dir, self.decompress_data)
+
+        # The garbage collector finds the blobs a patch uses from its fingerprint, so it must be on disk before any blob
+        # is linked, even when fingerprint.json isn't a wanted file or the download gets interrupted
+        if self.blob_store is not None:
+            self.save_fingerprint()
+
+        queued_files = []
+        missing_files = []
+        completed_files = []
+
+        # Patch downloaded before journals existed, the filesystem is all we can rely on
+        if not self.overwrite and not self.journal.exists:
+            existing_files = self.fingerprint_index.scan_existing(self.patch_dir)
+
+        files = self.fingerprint_index.entries(self.wanted_extensions)
+
+        # Diff mode, only the files added or modified since another patch
+        if self.wanted_files is not None:
+            files = [file for file in files if file['file'] in self.wanted_files]
+
+        if self.is_wanted('fingerprint.json'):
+            files = files + [{'file': 'fingerprint.json'}]
+
+        for file in files:
+            entry = (file['file'], file.get('sha'))
+
+            if self.overwrite:
+                queued_files.append(entry)
+
+            elif self.journal.exists:
+                if not self.journal.is_complete(*entry):
+                    missing_files.append(entry)
+
+            elif file['file'] in existing_files:
+                completed_files.append(entry)
+
+            else:
+                missing_files.append(entry)
+
+        for filename, sha in missing_files:
+            # A failed file may be linked to a corrupt blob, it is downloaded again and replaces the blob
+            if self.blob_store is not None and sha is not None and not self.journal.is_failed(filename) and self.blob_store.has(self.blob_key(filename, sha)):
+                self.blob_store.link(self.blob_key(filename, sha), join_path(self.patch_dir, filename))
+                completed_files.append((filename, sha))
+                self.reused_files += 1
+
+            elif sha in sha_index:
+                link_file(sha_index[sha], join_path(self.patch_dir, filename))
+                completed_files.append((filename, sha))
+                self.reused_files += 1
+
+            else:
+                queued_files.append((filename, sha))
+
+        self.journal.record_many(completed_files, COMPLETE)
+        self.journal.record_many(queued_files, QUEUED)
+
+        for filename, sha in queued_files:
+            self.file_shas[filename] = sha
+
+        return queued_files
+
+    def save_fingerprint(self):
+        path = join_path(self.patch_dir, 'fingerprint.json')
+
+        os.makedirs(self.patch_dir, exist_ok=True)
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.fingerprint, f)
+
+        os.replace(path + '.tmp', path)
+
+    def prepare_pipeline(self):
+        self.network_stats = StageStats('network', self.workers_count)
+        self.host_scheduler = HostScheduler(self.assets_hosts)
+        self.decompression_stage = DecompressionStage(self.metrics)
+
+        # In auto mode workers_count is only the ceiling, the controller decides how many of them actually work
+        self.concurrency_controller = ConcurrencyController(self, self.workers_count, self.auto_workers)
+
+    def run(self):
+        self.metrics.start()
+
+        if self.auto_workers:
+            self.concurrency_controller.start()
+
+        try:
+            if self.engine == 'Asyncio':
+                # Imported here so the threaded engine and the CLI don't pay for loading aiohttp
+                from lib.async_engine import AsyncEngine
+
+                AsyncEngine(self).run()
+
+            else:
+                self.run_threads()
+
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+
+        finally:
+            if self.auto_workers:
+                self.concurrency_controller.stop()
+                self.concurrency_controller.save_log()
+
+            # Waits for the files still being decompressed
+            self.decompression_stage.shutdown()
+            self.finish()
+            self.save_metrics()
+
+    def finish(self):
+        self.journal.close()
+        self.size_index.save()
+
+    def run_threads(self):
+        # Shared between workers so keep-alive connections are reused across files instead of reconnecting each time
+        self.connection_pool = ConnectionPool(max_idle_per_host=self.workers_count, timeout=self.request_timeout)
+
+        threads = [DownloadWorker(self) for _ in range(self.workers_count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.connection_pool.close()
+
+    def next_file(self):
+        try:
+            filename = self.download_queue.get_nowait()[-1]
+
+        except Empty:
+            return None
+
+        # Every file is queued before the run starts, so the wait is the time since the run started
+        self.metrics.observe(QUEUE_WAIT, self.metrics.elapsed_time())
+
+        return filename
+
+    def save_metrics(self):
+        summary = run_summary(self)
+
+        write_json_summary(join_path(self.patch_dir, METRICS_FILENAME.format(self.metrics.started_at.strftime('%Y%m%dT%H%M%S'))), summary)
+
+        if self.metrics_textfile:
+            write_prometheus_textfile(self.metrics_textfile, summary)
+
+    def file_path(self, filename):
+        return join_path(self.patch_dir, filename)
+
+    def file_url(self, host, filename):
+        return join_path(host, self.masterhash, filename)
+
+    def on_file_started(self, filename):
+        self.journal.record(filename, IN_FLIGHT)
+
+    def blob_key(self, filename, sha):
+        return BlobStore.key(filename, sha, self.decompress_data)
+
+    def is_sha_valid(self, filename, sha):
+        expected_sha = self.file_shas.get(filename)
+
+        return expected_sha is None or expected_sha == sha
+
+    def record_size(self, filename, size):
+        self.size_index.record(self.file_shas.get(filename), size)
+
+        with self.lock:
+            self.downloaded_bytes += size
+
+    def on_file_saved(self, filename, error=None):
+        if error is not None:
+            self.journal.record(filename, FAILED)
+
+            # Dead letters, reported once the download is over and queued again on the next run
+            with self.lock:
+                self.failed_files.append((filename, error))
+
+            if self.on_file_failed is not None:
+                self.on_file_failed(filename, error)
+
+            return
+
+        sha = self.file_shas.get(filename)
+
+        # The patch folder keeps a link to the stored blob, so a file shared by several patches is on disk once
+        if self.blob_store is not None and sha is not None:
+            try:
+                self.blob_store.store(join_path(self.patch_dir, filename), self.blob_key(filename, sha))
+
+            except OSError as store_error:
+                return self.on_file_saved(filename, store_error)
+
+        self.journal.record(filename, COMPLETE)
+
+        with self.lock:
+            self.downloaded_files += 1
+
+        if self.on_file_downloaded is not None:
+            self.on_file_downloaded(filename)
+
+    def stats_summary(self):
+        return '{}, {} | {}'.format(self.network_stats.summary(), self.decompression_stage.stats.summary(), self.host_scheduler.summary())
+
+    def stop(self):
+        self.is_running = False
@@ -0,0 +1,46 @@
+import os
+import json
+
+from lib.utils import join_path
+from lib.downloader import fetch_fingerprint
+
+
+def diff_fingerprints(old_fingerprint, new_fingerprint):
+    # Files are matched by path through dicts so tens of thousands of entries are compared in one pass each
+    old_shas = {file['file']: file.get('sha') for file in old_fingerprint['files']}
+    new_shas = {file['file']: file.get('sha') for file in new_fingerprint['files']}
+
+    return {
+        'from': old_fingerprint['sha'],
+        'to': new_fingerprint['sha'],
+        'from_version': old_fingerprint.get('version'),
+        'to_version': new_fingerprint.get('version'),
+        'added': sorted(filename for filename in new_shas if filename not in old_shas),
+        'removed': sorted(filename for filename in old_shas if filename not in new_shas),
+        'modified': sorted(filename for filename, sha in new_shas.items() if filename in old_shas and old_shas[filename] != sha)
+    }
+
+
+def changed_files(diff):
+    return set(diff['added']) | set(diff['modified'])
+
+
+def write_diff_report(patch_dir, diff):
+    os.makedirs(patch_dir, exist_ok=True)
+
+    path = join_path(patch_dir, 'diff_{}.json'.format(diff['from']))
+
+    with open(path, 'w') as f:
+        json.dump(diff, f, indent=4)
+
+    return path
+
+
+def load_patch_fingerprint(output_path, assets_hosts, masterhash):
+    # A patch that was already downloaded has its fingerprint on disk, no need to ask the servers again
+    try:
+        with open(join_path(output_path, masterhash, 'fingerprint.json')) as f:
+            return json.load(f)
+
+    except (OSError, ValueError):
+        return fetch_fingerprint(assets_hosts, masterhash)
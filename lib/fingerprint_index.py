@@ -0,0 +1,79 @@
+import os
+
+from lib.utils import join_path
+
+
+class FingerprintIndex:
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.files = fingerprint['files']
+
+        self.by_sha = {}
+        self.by_extension = {}
+
+        # Directory -> files directly in it, every parent directory of a file has an entry even without files
+        self.tree = {'': []}
+
+        for file in self.files:
+            filename = file['file']
+
+            self.by_extension.setdefault(os.path.splitext(filename)[1], []).append(file)
+
+            if 'sha' in file:
+                self.by_sha.setdefault(file['sha'], []).append(file)
+
+            directory = os.path.dirname(filename)
+            self.tree.setdefault(directory, []).append(file)
+
+            while directory:
+                directory = os.path.dirname(directory)
+                self.tree.setdefault(directory, [])
+
+    @property
+    def extensions(self):
+        # In order of first appearance in the fingerprint
+        return list(self.by_extension)
+
+    def entries(self, extensions=None):
+        if extensions is None:
+            return self.files
+
+        entries = []
+
+        for ext, files in self.by_extension.items():
+            if ext in extensions:
+                entries += files
+
+            # Longer suffixes such as _tex.sc only need checking against the files of their last extension
+            elif ext and any(suffix.endswith(ext) for suffix in extensions):
+                entries += [file for file in files if file['file'].endswith(extensions)]
+
+        return entries
+
+    def scan_existing(self, root):
+        # One os.scandir walk of root, only going down directories the fingerprint has files in
+        existing = set()
+        directories = ['']
+
+        while directories:
+            directory = directories.pop()
+
+            try:
+                entries = os.scandir(join_path(root, directory) if directory else root)
+
+            except OSError:
+                continue
+
+            with entries:
+                for entry in entries:
+                    path = join_path(directory, entry.name) if directory else entry.name
+
+                    if entry.is_dir():
+                        if path in self.tree:
+                            directories.append(path)
+
+                    elif entry.is_file():
+                        existing.add(path)
+
+        return existing
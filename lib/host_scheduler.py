@@ -0,0 +1,98 @@
+import time
+import threading
+
+
+class HostStats:
+
+    # Latency given to hosts without any sample yet so each of them gets tried early
+    UNKNOWN_LATENCY = 0.001
+
+    def __init__(self, host):
+        self.host = host
+
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.busy_time = 0.0
+        self.latency = None
+
+        self.consecutive_errors = 0
+        self.unavailable_until = 0
+
+    def expected_time(self):
+        latency = self.latency if self.latency is not None else self.UNKNOWN_LATENCY
+        error_rate = self.errors / (self.files + self.errors + 1)
+
+        # Queueing one more file behind the ones in flight, slowed down by how often the host fails
+        return latency * (self.in_flight + 1) / max(1 - error_rate, 0.05)
+
+    def summary(self):
+        return '{}: {} files, {:.2f} MB/s, {:.0f} ms/file, {} errors'.format(self.host, self.files,
+                                                                             self.bytes / max(self.busy_time, 1e-6) / 1024 / 1024,
+                                                                             (self.latency or 0) * 1000,
+                                                                             self.errors)
+
+
+class HostScheduler:
+
+    # Weight of the newest sample in the per-host latency moving average
+    SMOOTHING = 0.2
+
+    # A failing host is set aside for 1s, then 2s, 4s... up to a minute while it keeps failing
+    MAX_COOLDOWN = 60
+
+    def __init__(self, hosts):
+        self.hosts = [HostStats(host) for host in hosts]
+        self.lock = threading.Lock()
+
+    def acquire(self, exclude=()):
+        with self.lock:
+            candidates = [stats for stats in self.hosts if stats.host not in exclude]
+
+            if not candidates:
+                return None
+
+            now = time.monotonic()
+            available = [stats for stats in candidates if stats.unavailable_until <= now]
+
+            # When every remaining host is cooling down, still try the best of them rather than failing the file
+            stats = min(available or candidates, key=HostStats.expected_time)
+            stats.in_flight += 1
+
+            return stats.host
+
+    def get_stats(self, host):
+        return next(stats for stats in self.hosts if stats.host == host)
+
+    def cancel(self, host):
+        with self.lock:
+            self.get_stats(host).in_flight -= 1
+
+    def release(self, host, elapsed_time, size=0, failed=False):
+        with self.lock:
+            stats = self.get_stats(host)
+            stats.in_flight -= 1
+
+            if failed:
+                stats.errors += 1
+                stats.consecutive_errors += 1
+                stats.unavailable_until = time.monotonic() + min(2 ** (stats.consecutive_errors - 1), self.MAX_COOLDOWN)
+
+                return
+
+            stats.consecutive_errors = 0
+
+            stats.files += 1
+            stats.bytes += size
+            stats.busy_time += elapsed_time
+
+            if stats.latency is None:
+                stats.latency = elapsed_time
+
+            else:
+                stats.latency += self.SMOOTHING * (elapsed_time - stats.latency)
+
+    def summary(self):
+        with self.lock:
+            return ', '.join(stats.summary() for stats in self.hosts)
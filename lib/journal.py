@@ -0,0 +1,92 @@
+import os
+import json
+import threading
+
+from lib.utils import join_path
+from lib.transfer import needs_decompression
+
+
+JOURNAL_FILENAME = '.journal'
+
+QUEUED = 'queued'
+IN_FLIGHT = 'in-flight'
+COMPLETE = 'complete'
+FAILED = 'failed'
+
+
+def read_journal(patch_dir):
+    # File -> (state, sha, stored decompressed)
+    entries = {}
+
+    try:
+        with open(join_path(patch_dir, JOURNAL_FILENAME)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+
+                except ValueError:
+                    # The app was killed while appending, everything before this line is still valid
+                    break
+
+                entries[entry['file']] = (entry['state'], entry['sha'], entry['decompressed'])
+
+    except OSError:
+        pass
+
+    return entries
+
+
+class Journal:
+
+    def __init__(self, patch_dir, decompress_data=False):
+        os.makedirs(patch_dir, exist_ok=True)
+
+        self.path = join_path(patch_dir, JOURNAL_FILENAME)
+        self.exists = os.path.isfile(self.path)
+        self.decompress_data = decompress_data
+        self.entries = read_journal(patch_dir) if self.exists else {}
+        self.lock = threading.Lock()
+
+        self.compact()
+
+        self.file = open(self.path, 'a')
+
+    def compact(self):
+        with open(self.path + '.tmp', 'w') as f:
+            for filename, (state, sha, decompressed) in self.entries.items():
+                f.write(self.format_entry(filename, state, sha, decompressed))
+
+        os.replace(self.path + '.tmp', self.path)
+
+    @staticmethod
+    def format_entry(filename, state, sha, decompressed):
+        return json.dumps({'file': filename, 'state': state, 'sha': sha, 'decompressed': decompressed}) + '\n'
+
+    def is_complete(self, filename, sha):
+        # A CSV / SC file stored the other way than this run wants it is downloaded again
+        return self.entries.get(filename) == (COMPLETE, sha, bool(needs_decompression(filename, self.decompress_data)))
+
+    def is_failed(self, filename):
+        return self.entries.get(filename, (None,))[0] == FAILED
+
+    def record(self, filename, state):
+        self.record_many([(filename, self.entries.get(filename, (None, None, None))[1])], state)
+
+    def record_many(self, files, state, decompressed=None):
+        # Files are recorded as stored the way this run stores them, unless told otherwise
+        if decompressed is None:
+            decompressed = self.decompress_data
+
+        with self.lock:
+            if self.file.closed:
+                return
+
+            for filename, sha in files:
+                self.entries[filename] = (state, sha, bool(needs_decompression(filename, decompressed)))
+                self.file.write(self.format_entry(filename, state, sha, self.entries[filename][2]))
+
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
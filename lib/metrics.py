@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import threading
+
+from bisect import bisect_left
+from datetime import datetime
+
+
+PROMETHEUS_PREFIX = 'sc_assets_downloader'
+
+# Upper bounds in seconds, the same for every stage so their histograms can be compared
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+QUEUE_WAIT = 'queue_wait'
+FIRST_BYTE = 'time_to_first_byte'
+TRANSFER = 'transfer'
+DECOMPRESS = 'decompress'
+WRITE = 'write'
+
+STAGES = (QUEUE_WAIT, FIRST_BYTE, TRANSFER, DECOMPRESS, WRITE)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+
+        # One more count for the values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th value, the max when it is above the last bound
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def to_dict(self):
+        cumulative_counts = []
+        seen = 0
+
+        for count in self.counts:
+            seen += count
+            cumulative_counts.append(seen)
+
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], cumulative_counts))
+        }
+
+
+class PipelineMetrics:
+
+    def __init__(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+        # Error type -> attempts that failed with it, retried ones included
+        self.errors = {}
+
+        # Counted as chunks arrive, big files show up long before they are complete
+        self.received_bytes = 0
+
+        self.started_at = datetime.utcnow()
+        self.start_time = time.monotonic()
+
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.started_at = datetime.utcnow()
+        self.start_time = time.monotonic()
+
+    def elapsed_time(self):
+        return time.monotonic() - self.start_time
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].observe(seconds)
+
+    def record_bytes(self, size):
+        with self.lock:
+            self.received_bytes += size
+
+    def record_error(self, error):
+        name = type(error).__name__
+
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def timings(self):
+        with self.lock:
+            return {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}
+
+
+def run_summary(downloader):
+    metrics = downloader.metrics
+
+    with downloader.lock:
+        downloaded_files = downloader.downloaded_files
+        failed_files = len(downloader.failed_files)
+        downloaded_bytes = downloader.downloaded_bytes
+
+    with metrics.lock:
+        errors = dict(metrics.errors)
+
+    return {
+        'masterhash': downloader.masterhash or None,
+        'started_at': metrics.started_at.isoformat(),
+        'duration': metrics.elapsed_time(),
+        'engine': downloader.engine,
+        'workers': downloader.workers_count,
+        'decompress': downloader.decompress_data,
+        'files': {
+            'queued': downloader.total_files,
+            'reused': downloader.reused_files,
+            'downloaded': downloaded_files,
+            'failed': failed_files
+        },
+        'bytes': {
+            'downloaded': downloaded_bytes,
+            'decompressed': downloader.decompression_stage.stats.bytes
+        },
+        'errors': errors,
+        'timings': metrics.timings(),
+        'hosts': {stats.host: {'files': stats.files, 'bytes': stats.bytes, 'errors': stats.errors} for stats in downloader.host_scheduler.hosts}
+    }
+
+
+def write_json_summary(path, summary):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=4)
+
+
+def format_labels(**labels):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels.items())
+
+
+def write_prometheus_textfile(path, summary):
+    lines = []
+
+    def add_metric(name, metric_type, help, samples):
+        lines.append('# HELP {}_{} {}'.format(PROMETHEUS_PREFIX, name, help))
+        lines.append('# TYPE {}_{} {}'.format(PROMETHEUS_PREFIX, name, metric_type))
+
+        for suffix, labels, value in samples:
+            lines.append('{}_{}{}{{{}}} {}'.format(PROMETHEUS_PREFIX, name, suffix, labels, value))
+
+    run_labels = {'masterhash': summary['masterhash'] or 'batch', 'engine': summary['engine']}
+
+    add_metric('run_start_time_seconds', 'gauge', 'When the last run started, as a unix timestamp',
+               [('', format_labels(**run_labels), (datetime.fromisoformat(summary['started_at']) - datetime(1970, 1, 1)).total_seconds())])
+
+    add_metric('run_duration_seconds', 'gauge', 'How long the last run took',
+               [('', format_labels(**run_labels), summary['duration'])])
+
+    add_metric('files', 'gauge', 'Files of the last run by result',
+               [('', format_labels(result=result, **run_labels), count) for result, count in summary['files'].items()])
+
+    add_metric('bytes', 'gauge', 'Bytes of the last run, as downloaded and after decompression',
+               [('', format_labels(kind=kind, **run_labels), count) for kind, count in summary['bytes'].items()])
+
+    add_metric('errors', 'gauge', 'Failed attempts of the last run by error type, retried ones included',
+               [('', format_labels(type=name, **run_labels), count) for name, count in sorted(summary['errors'].items())])
+
+    samples = []
+
+    for stage, timing in summary['timings'].items():
+        for bound, count in timing['buckets'].items():
+            samples.append(('_bucket', format_labels(stage=stage, le=bound, **run_labels), count))
+
+        samples.append(('_sum', format_labels(stage=stage, **run_labels), timing['sum']))
+        samples.append(('_count', format_labels(stage=stage, **run_labels), timing['count']))
+
+    add_metric('stage_seconds', 'histogram', 'Time spent per file in each stage of the pipeline', samples)
+
+    # The textfile collector may read at any time, it must never see a half written file
+    temporary_path = path + '.tmp'
+
+    with open(temporary_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    os.replace(temporary_path, path)
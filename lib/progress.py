@@ -0,0 +1,49 @@
+import time
+
+
+class ProgressMeter:
+
+    # Weight of the newest sample in the files/s and bytes/s moving averages
+    SMOOTHING = 0.3
+
+    def __init__(self, total_files):
+        self.total_files = total_files
+
+        self.files = 0
+        self.bytes = 0
+        self.files_rate = None
+        self.bytes_rate = None
+        self.last_update = time.monotonic()
+
+    def update(self, files, bytes):
+        now = time.monotonic()
+        elapsed_time = now - self.last_update
+
+        if elapsed_time <= 0:
+            return
+
+        files_rate = (files - self.files) / elapsed_time
+        bytes_rate = (bytes - self.bytes) / elapsed_time
+
+        if self.files_rate is None:
+            self.files_rate, self.bytes_rate = files_rate, bytes_rate
+
+        else:
+            self.files_rate += self.SMOOTHING * (files_rate - self.files_rate)
+            self.bytes_rate += self.SMOOTHING * (bytes_rate - self.bytes_rate)
+
+        self.files, self.bytes = files, bytes
+        self.last_update = now
+
+    def eta(self):
+        if not self.files_rate:
+            return None
+
+        return int((self.total_files - self.files) / self.files_rate)
+
+    def summary(self):
+        eta = self.eta()
+
+        return '{:.1f} files/s, {:.2f} MB/s, ETA {}'.format(self.files_rate or 0,
+                                                            (self.bytes_rate or 0) / 1024 / 1024,
+                                                            '{}min {}s'.format(*divmod(eta, 60)) if eta is not None else '-')
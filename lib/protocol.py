@@ -0,0 +1,71 @@
+import socket
+
+from lib.reader import Reader
+from lib.writer import Writer
+
+
+GAME_HOST = 'game.clashroyaleapp.com'
+GAME_PORT = 9339
+
+
+def receive(s, length):
+    # Received straight into a buffer of the final size instead of concatenating every chunk
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+
+    while received < length:
+        received_length = s.recv_into(view[received:])
+
+        if not received_length:
+            raise ConnectionError('connection closed after {} of {} bytes'.format(received, length))
+
+        received += received_length
+
+    return buffer
+
+
+def request_login_failed(major, build):
+    client_hello_writer = Writer()
+
+    client_hello_writer.write_int(3)
+    client_hello_writer.write_int(27)
+    client_hello_writer.write_int(major)
+    client_hello_writer.write_int(build)
+    client_hello_writer.write_int(0)
+    client_hello_writer.write_string('')
+    client_hello_writer.write_int(2)
+    client_hello_writer.write_int(2)
+
+    client_hello = (10100).to_bytes(2, 'big') + len(client_hello_writer.buffer).to_bytes(3, 'big') + bytes(2) + client_hello_writer.buffer
+
+    s = socket.create_connection((GAME_HOST, GAME_PORT))
+    s.send(client_hello)
+
+    header = receive(s, 7)
+    login_failed = receive(s, int.from_bytes(header[2:5], 'big'))
+
+    s.close()
+
+    return Reader(login_failed)
+
+
+def read_assets_info(login_failed):
+    # Expects the error code (7) to be already read
+    login_failed.read_string()
+
+    login_failed.read_string()
+    login_failed.read_string()
+    login_failed.read_string()
+    login_failed.read_vint()
+    login_failed.read_vint()
+    login_failed.read_string()
+
+    assets_hosts = [login_failed.read_string() for _ in range(login_failed.read_vint())]
+
+    login_failed.read_string()
+    login_failed.read_byte()
+
+    fingerprint = login_failed.read_compressed_string()
+
+    return assets_hosts, fingerprint
@@ -0,0 +1,33 @@
+import time
+import threading
+
+
+class TokenBucket:
+
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        # A rate of 0 means unlimited, it can be changed while a download is running
+        with self.lock:
+            self.rate = rate
+            self.tokens = rate
+            self.last_refill = time.monotonic()
+
+    def take(self, amount):
+        # Returns how long the caller has to wait before using what it took
+        with self.lock:
+            if not self.rate:
+                return 0
+
+            now = time.monotonic()
+
+            # Up to one second worth of tokens can be saved up as a burst
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+
+            # Going into debt lets a chunk bigger than the bucket through, the next takers pay for it
+            self.tokens -= amount
+
+            return max(0, -self.tokens / self.rate)
@@ -1,48 +1,94 @@
 # -*- coding: utf-8 -*-
 import zlib
+import struct
 
-from io import BytesIO
 
+UINT32_BE = struct.Struct('>I')
+UINT32_LE = struct.Struct('<I')
 
-class Reader(BytesIO):
+
+def rotate_first_vint_byte(i):
+    seventh = (i & 0x40) >> 6  # save 7th bit
+    msb = (i & 0x80) >> 7  # save msb
+    i <<= 1  # rotate to the left
+    i &= ~(0x181)  # clear 8th and 1st bit and 9th if any
+    i |= (msb << 7) | (seventh)  # insert msb and 6th back in
+
+    return i
+
+
+# The first byte of a vint is rotated, doing it once per possible value turns it into a lookup
+FIRST_VINT_BYTES = [rotate_first_vint_byte(i) for i in range(256)]
+
+
+class Reader:
+
+    def __init__(self, buffer=b''):
+        # Reads are slices of the received message, it is never copied as a whole
+        self.data = buffer
+        self.buffer = memoryview(buffer)
+        self.length = len(buffer)
+        self.offset = 0
+
+    def skip(self, length):
+        # Returns the offset of the skipped bytes, after checking they are all there
+        offset = self.offset
+        end = offset + length
+
+        if length < 0 or end > self.length:
+            raise EOFError('cannot read {} bytes at offset {}, the message is {} bytes long'.format(length, offset, self.length))
+
+        self.offset = end
+
+        return offset
+
+    def read(self, length=-1):
+        if length < 0:
+            length = self.length - self.offset
+
+        offset = self.skip(length)
+
+        return self.buffer[offset:offset + length].tobytes()
 
     def read_byte(self):
-        return int.from_bytes(self.read(1), 'big')
+        offset = self.offset
+
+        # Inlined bounds check, vints call this for every byte
+        if offset >= self.length:
+            self.skip(1)
+
+        self.offset = offset + 1
+
+        return self.data[offset]
 
     def read_int(self):
-        return int.from_bytes(self.read(4), 'big')
+        return UINT32_BE.unpack_from(self.data, self.skip(4))[0]
 
     def read_vint(self):
-        shift = 0
-        result = 0
+        i = FIRST_VINT_BYTES[self.read_byte()]
+        result = i & 0x7f
+        shift = 7
 
-        while True:
+        while i & 0x80:
             i = self.read_byte()
-
-            if shift == 0:
-                seventh = (i & 0x40) >> 6  # save 7th bit
-                msb = (i & 0x80) >> 7  # save msb
-                i <<= 1  # rotate to the left
-                i &= ~(0x181)  # clear 8th and 1st bit and 9th if any
-                i |= (msb << 7) | (seventh)  # insert msb and 6th back in
-
             result |= (i & 0x7f) << shift
             shift += 7
 
-            if not i & 0x80:
-                break
-
-        return ((result) >> 1) ^ (-((result) & 1))
+        return (result >> 1) ^ (-(result & 1))
 
     def read_string(self):
         length = self.read_int()
 
         if length != 0xffffffff:
-            return self.read(length).decode('utf-8')
+            offset = self.skip(length)
+
+            # Strings are short, decoding a slice of the message is faster than going through the view
+            return self.data[offset:offset + length].decode('utf-8')
 
     def read_compressed_string(self):
         length = self.read_int()
 
         if length != 0xffffffff:
-            zlength = int.from_bytes(self.read(4), 'little')
-            return zlib.decompress(self.read(length - 4), 15, zlength).decode('utf-8')
+            zlength = UINT32_LE.unpack_from(self.data, self.skip(4))[0]
+            offset = self.skip(length - 4)
+            return zlib.decompress(self.buffer[offset:offset + length - 4], 15, zlength).decode('utf-8')
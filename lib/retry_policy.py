@@ -0,0 +1,104 @@
+import os
+import time
+import random
+
+from lib.metrics import TRANSFER
+from lib.verify import ChecksumError
+
+
+class RetryPolicy:
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=10):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        # Full jitter keeps workers that failed together from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def is_permanent(status):
+        # The file is missing or refused on this host, retrying there won't help
+        return 400 <= status < 500 and status not in (408, 429)
+
+
+class FileAttempts:
+
+    # Host failover, backoff and bookkeeping for the attempts of one file, the engines only do the transfer itself
+
+    def __init__(self, downloader, filename):
+        self.downloader = downloader
+        self.filename = filename
+        self.retry_policy = downloader.retry_policy
+
+        self.attempt = 0
+        self.host = None
+        self.start_time = 0
+        self.last_error = None
+
+        self.failed_hosts = []
+        self.missing_hosts = []
+
+    def next_host(self):
+        # Returns the host to try and how long to wait before sending the request, raises the last error once out of attempts
+        downloader = self.downloader
+
+        if self.attempt > self.retry_policy.max_retries:
+            raise self.last_error
+
+        delay = 0
+        host = downloader.host_scheduler.acquire(exclude=self.failed_hosts + self.missing_hosts)
+
+        if host is None:
+            # Every host said the file doesn't exist
+            if not self.failed_hosts:
+                raise self.last_error
+
+            # Every host failed this round, wait before going through them again
+            delay = self.retry_policy.delay(self.attempt)
+
+            self.failed_hosts = []
+            host = downloader.host_scheduler.acquire(exclude=self.missing_hosts)
+
+        delay += downloader.request_limiter.take(1)
+
+        self.attempt += 1
+        self.host = host
+
+        # The request goes out once the engine has waited the delay
+        self.start_time = time.monotonic() + delay
+
+        return host, delay
+
+    def failed(self, error, status=None):
+        downloader = self.downloader
+
+        if status is not None and self.retry_policy.is_permanent(status):
+            downloader.host_scheduler.cancel(self.host)
+            self.missing_hosts.append(self.host)
+
+        else:
+            downloader.host_scheduler.release(self.host, time.monotonic() - self.start_time, failed=True)
+            self.failed_hosts.append(self.host)
+
+        self.last_error = error
+        downloader.metrics.record_error(error)
+
+    def succeeded(self, part_path, size, sha):
+        downloader = self.downloader
+        elapsed_time = time.monotonic() - self.start_time
+
+        # A corrupt transfer counts as a failure of the host and the file is downloaded again
+        if not downloader.is_sha_valid(self.filename, sha):
+            os.remove(part_path)
+            self.failed(ChecksumError('sha mismatch for {} from {}'.format(self.filename, self.host)))
+
+            return False
+
+        downloader.host_scheduler.release(self.host, elapsed_time, size)
+        downloader.network_stats.record(size, elapsed_time)
+        downloader.metrics.observe(TRANSFER, elapsed_time)
+        downloader.record_size(self.filename, size)
+
+        return True
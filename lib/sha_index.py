@@ -0,0 +1,76 @@
+import os
+import json
+import shutil
+
+from lib.utils import join_path
+from lib.journal import COMPLETE, read_journal
+from lib.transfer import COMPRESSED_EXTENSIONS
+
+
+class StorageModes:
+
+    def __init__(self, patch_dir):
+        self.entries = read_journal(patch_dir)
+
+    def expected(self, filename):
+        # Whether the file is meant to be stored decompressed, None for folders downloaded before journals existed
+        return self.entries.get(filename, (None, None, None))[2]
+
+    def is_complete(self, filename):
+        # Files of folders downloaded before journals existed are only known from being on disk
+        return self.entries.get(filename, (COMPLETE,))[0] == COMPLETE
+
+    def stored(self, filename):
+        # Same for the file currently on disk, None while it waits to be downloaded again, it may still be stored the other way
+        state, _, decompressed = self.entries.get(filename, (None, None, None))
+
+        return decompressed if state == COMPLETE else None
+
+
+def build_sha_index(output_path, decompressed, exclude=None):
+    index = {}
+
+    if not os.path.isdir(output_path):
+        return index
+
+    for entry in os.scandir(output_path):
+        if not entry.is_dir() or entry.name == exclude:
+            continue
+
+        try:
+            with open(join_path(entry.path, 'fingerprint.json')) as f:
+                fingerprint = json.load(f)
+
+        except (OSError, ValueError):
+            continue
+
+        storage_modes = StorageModes(entry.path)
+
+        for file in fingerprint.get('files', []):
+            if 'sha' not in file or file['sha'] in index:
+                continue
+
+            # Files that failed to download or to verify may be corrupt
+            if not storage_modes.is_complete(file['file']):
+                continue
+
+            # Only reuse CSV / SC files stored the same way (raw or decompressed) as we want them now
+            if file['file'].endswith(COMPRESSED_EXTENSIONS) and storage_modes.stored(file['file']) != decompressed:
+                continue
+
+            path = join_path(entry.path, file['file'])
+
+            if os.path.isfile(path):
+                index[file['sha']] = path
+
+    return index
+
+
+def link_file(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    try:
+        os.link(source, destination)
+
+    except OSError:
+        shutil.copyfile(source, destination)
@@ -0,0 +1,59 @@
+import os
+import json
+import threading
+
+from lib.utils import join_path
+
+
+SIZE_INDEX_FILENAME = '.sizes.json'
+
+
+class SizeIndex:
+
+    def __init__(self, output_path):
+        self.path = join_path(output_path, SIZE_INDEX_FILENAME)
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+
+        except (OSError, ValueError):
+            index = {'sizes': {}, 'extensions': {}}
+
+        self.sizes = index['sizes']
+        self.extension_sizes = index['extensions']
+
+    def record(self, sha, size):
+        if sha is not None:
+            with self.lock:
+                self.sizes[sha] = size
+
+    def estimate(self, filename, sha):
+        if sha in self.sizes:
+            return self.sizes[sha]
+
+        return self.extension_sizes.get(os.path.splitext(filename)[1], 0)
+
+    def learn_extensions(self, files):
+        # Files never downloaded before are estimated from the average known size of their extension, among every file
+        # of the patch and not only the queued ones, which are mostly new when the rest of the patch is already there
+        totals = {}
+
+        for filename, sha in files:
+            if sha in self.sizes:
+                total = totals.setdefault(os.path.splitext(filename)[1], [0, 0])
+                total[0] += self.sizes[sha]
+                total[1] += 1
+
+        # Extensions without any known file in this patch keep the average saved by earlier runs
+        self.extension_sizes.update({ext: size // count for ext, (size, count) in totals.items()})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self.lock:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({'sizes': self.sizes, 'extensions': self.extension_sizes}, f)
+
+        os.replace(self.path + '.tmp', self.path)
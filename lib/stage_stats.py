@@ -0,0 +1,33 @@
+import time
+import threading
+
+
+class StageStats:
+
+    def __init__(self, name, workers_count):
+        self.name = name
+        self.workers_count = workers_count
+
+        self.files = 0
+        self.bytes = 0
+        self.busy_time = 0.0
+        self.start_time = time.monotonic()
+
+        self.lock = threading.Lock()
+
+    def record(self, size, busy_time):
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+            self.busy_time += busy_time
+
+    def summary(self):
+        elapsed_time = max(time.monotonic() - self.start_time, 1e-6)
+
+        # A stage close to 100% busy is the one holding the pipeline back
+        utilization = self.busy_time / (elapsed_time * self.workers_count)
+
+        return '{}: {:.1f} files/s, {:.2f} MB/s, {:.0%} busy'.format(self.name,
+                                                                    self.files / elapsed_time,
+                                                                    self.bytes / elapsed_time / 1024 / 1024,
+                                                                    utilization)
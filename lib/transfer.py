@@ -0,0 +1,108 @@
+import os
+import time
+import hashlib
+
+from lib.metrics import FIRST_BYTE, WRITE
+from lib.compression import DecompressionError, decompress_file
+
+
+CHUNK_SIZE = 64 * 1024
+COMPRESSED_EXTENSIONS = ('.csv', '.sc')
+
+
+def needs_decompression(path, decompress_data):
+    return decompress_data and path.endswith(COMPRESSED_EXTENSIONS)
+
+
+class PartFile:
+
+    # A download being written to its .part file, the engines only read the chunks and wait the delays it returns
+
+    def __init__(self, path, bandwidth_limiter, metrics):
+        self.path = path + '.part'
+        self.bandwidth_limiter = bandwidth_limiter
+        self.metrics = metrics
+
+        self.size = 0
+        self.write_time = 0.0
+
+        # Hashed as it streams in so checking the fingerprint sha doesn't read the file a second time
+        self.sha = hashlib.sha1()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def __enter__(self):
+        self.file = open(self.path, 'wb')
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+
+        if exc_type is None:
+            self.metrics.observe(WRITE, self.write_time)
+
+    def write(self, chunk):
+        write_start_time = time.monotonic()
+        self.file.write(chunk)
+        self.write_time += time.monotonic() - write_start_time
+
+        self.sha.update(chunk)
+        self.size += len(chunk)
+        self.metrics.record_bytes(len(chunk))
+
+        # Throttling each chunk rather than each file keeps the rate smooth with big files
+        return self.bandwidth_limiter.take(len(chunk))
+
+    def result(self):
+        return self.path, self.size, self.sha.hexdigest()
+
+
+def download_file(connection_pool, file_url, path, bandwidth_limiter, metrics):
+    start_time = time.monotonic()
+
+    with connection_pool.open(file_url) as file_data, PartFile(path, bandwidth_limiter, metrics) as part_file:
+        metrics.observe(FIRST_BYTE, time.monotonic() - start_time)
+
+        while True:
+            chunk = file_data.read(CHUNK_SIZE)
+
+            if not chunk:
+                break
+
+            time.sleep(part_file.write(chunk))
+
+    return part_file.result()
+
+
+def save_download(downloader, filename, part_path, path):
+    # Files to decompress are handed to the decompression stage, which reports them once done, the others are saved now
+    if needs_decompression(path, downloader.decompress_data):
+        downloader.decompression_stage.submit(part_path, path, lambda error: downloader.on_file_saved(filename, error))
+
+    else:
+        save_file(part_path, path, False)
+        downloader.on_file_saved(filename)
+
+
+def save_file(part_path, path, decompress_data):
+    if needs_decompression(path, decompress_data):
+        decompressed_path = part_path + '.decompressed'
+
+        result = decompress_file(part_path, decompressed_path)
+
+        if result.success:
+            os.remove(part_path)
+            part_path = decompressed_path
+
+        else:
+            os.remove(decompressed_path)
+
+            # Files that aren't compressed at all are kept as they are, anything else failing is corrupt or unknown
+            if result.format != 'raw' or result.sc_version is not None:
+                os.remove(part_path)
+
+                raise DecompressionError('cannot decompress {} data: {}'.format(result.format, result.error))
+
+    # Only complete files ever show up under their final name
+    os.replace(part_path, path)
@@ -0,0 +1,134 @@
+import os
+import json
+import mmap
+import hashlib
+
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.utils import join_path
+from lib.journal import Journal, COMPLETE, FAILED
+from lib.blob_store import BlobStore
+from lib.sha_index import StorageModes
+from lib.compression import detect_codec, read_sc_header
+from lib.transfer import COMPRESSED_EXTENSIONS
+
+
+OK = 'ok'
+MISSING = 'missing'
+MISMATCH = 'mismatch'
+COMPRESSED = 'compressed'
+UNVERIFIED = 'unverified'
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        # Empty files cannot be mapped
+        if not os.fstat(f.fileno()).st_size:
+            return hashlib.sha1().hexdigest()
+
+        # Hashing the mapped file lets the OS page it in without copying it through read buffers
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha1(data).hexdigest()
+
+
+def verify_file(path, sha, decompressed):
+    if not os.path.isfile(path):
+        return MISSING
+
+    is_compressed_file = path.endswith(COMPRESSED_EXTENSIONS)
+
+    if not decompressed or not is_compressed_file:
+        if hash_file(path) == sha:
+            return OK
+
+        # Folders downloaded before journals existed don't tell how CSV / SC files are stored, this one may be decompressed
+        if decompressed is not None or not is_compressed_file:
+            return MISMATCH
+
+    # The fingerprint sha is the one of the compressed file, only check it was really decompressed.
+    # LZMA CSV files have no SC header, so look for a codec after the header when there is one.
+    with open(path, 'rb') as f:
+        _, header_length = read_sc_header(f.read(14))
+
+        f.seek(header_length)
+        codec = detect_codec(f.read(9))
+
+    if codec is None:
+        return UNVERIFIED
+
+    # Still compressed without being the file of the fingerprint either
+    return COMPRESSED if decompressed else MISMATCH
+
+
+def find_patch_dirs(path):
+    if os.path.isfile(join_path(path, 'fingerprint.json')):
+        return [path]
+
+    if not os.path.isdir(path):
+        return []
+
+    return sorted(entry.path for entry in os.scandir(path) if entry.is_dir() and os.path.isfile(join_path(entry.path, 'fingerprint.json')))
+
+
+def verify_patch(patch_dir, executor):
+    with open(join_path(patch_dir, 'fingerprint.json')) as f:
+        fingerprint = json.load(f)
+
+    storage_modes = StorageModes(patch_dir)
+
+    # Only the files downloads of this patch queued, the others were left out by extension or diff and aren't missing.
+    # Folders downloaded before journals existed only have the files on disk to go by.
+    if storage_modes.entries:
+        files = [file for file in fingerprint['files'] if 'sha' in file and file['file'] in storage_modes.entries]
+
+    else:
+        files = [file for file in fingerprint['files'] if 'sha' in file and os.path.lexists(join_path(patch_dir, file['file']))]
+
+    modes = [storage_modes.expected(file['file']) for file in files]
+
+    # Most files are small, sending them by batches keeps the processes busy hashing rather than waiting for work
+    statuses = list(executor.map(verify_file,
+                                 [join_path(patch_dir, file['file']) for file in files],
+                                 [file['sha'] for file in files],
+                                 modes,
+                                 chunksize=64))
+
+    results = [(file['file'], status) for file, status in zip(files, statuses)]
+
+    # Unknown modes are what verifying found, CSV / SC files that aren't the raw file nor compressed are decompressed
+    modes = [status == UNVERIFIED if mode is None else mode for mode, status in zip(modes, statuses)]
+
+    # Deduplicated patches link their files to the blob store, the blob of a corrupt file must not be linked again
+    blob_store = BlobStore(os.path.dirname(patch_dir))
+
+    for file, mode, status in zip(files, modes, statuses):
+        if status in (MISMATCH, COMPRESSED):
+            blob_store.discard(join_path(patch_dir, file['file']), blob_store.key(file['file'], file['sha'], mode))
+
+    # Bad files are marked failed in the journal so the next download of this patch fetches them again
+    journal = Journal(patch_dir)
+
+    for decompressed in (False, True):
+        checked_files = [(file['file'], file['sha'], status) for file, mode, status in zip(files, modes, statuses) if mode == decompressed]
+
+        journal.record_many([(filename, sha) for filename, sha, status in checked_files if status in (OK, UNVERIFIED)], COMPLETE, decompressed)
+        journal.record_many([(filename, sha) for filename, sha, status in checked_files if status not in (OK, UNVERIFIED)], FAILED, decompressed)
+
+    journal.close()
+
+    return results
+
+
+def verify_tree(path, workers_count=None):
+    # Checks every patch folder under path, or path itself when it is a patch folder, hashing files on every core
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers_count) as executor:
+        for patch_dir in find_patch_dirs(path):
+            results[patch_dir] = verify_patch(patch_dir, executor)
+
+    return results
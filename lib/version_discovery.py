@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.protocol import request_login_failed
+
+
+def find_highest(is_too_high, start, probes_count, executor):
+    if is_too_high(start):
+        low, high = 0, start
+
+    else:
+        # Exponential probing: start + 1, start + 2, start + 4... until a too high value is found
+        low, high, exponent = start, None, 0
+
+        while high is None:
+            candidates = [start + 2 ** (exponent + i) for i in range(probes_count)]
+            exponent += probes_count
+
+            for candidate, too_high in zip(candidates, executor.map(is_too_high, candidates)):
+                if too_high:
+                    high = candidate
+                    break
+
+                low = candidate
+
+    # Then a k-ary search between the highest valid value and the lowest too high one
+    while high - low > 1:
+        step = (high - low) / (probes_count + 1)
+        candidates = sorted({min(high - 1, low + max(1, int(step * (i + 1)))) for i in range(probes_count)})
+
+        for candidate, too_high in zip(candidates, executor.map(is_too_high, candidates)):
+            if too_high:
+                high = candidate
+                break
+
+            low = candidate
+
+    return low
+
+
+def discover_version(major, build, probes_count=4, on_probe=None):
+    def request_error_code(major, build):
+        if on_probe is not None:
+            on_probe(major, build)
+
+        return request_login_failed(major, build).read_vint()
+
+    with ThreadPoolExecutor(probes_count) as executor:
+        # Check major first with build 0 to avoid getting error code 9 due to too high build instead of too high major
+        major = find_highest(lambda major: request_error_code(major, 0) == 9, major, probes_count, executor)
+        build = find_highest(lambda build: request_error_code(major, build) == 9, build, probes_count, executor)
+
+    return major, build
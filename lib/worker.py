@@ -1,55 +1,70 @@
-import os
+import time
+import threading
 
-from urllib.request import urlopen
-from PyQt5.QtCore import QThread, pyqtSignal
+from urllib.error import HTTPError
+from http.client import HTTPException
 
-from lib.utils import join_path
-from lib.compression import decompress
+from lib.retry_policy import FileAttempts
+from lib.transfer import download_file, save_download
 
 
-class DownloadWorker(QThread):
+class DownloadWorker(threading.Thread):
 
-    file_downloaded = pyqtSignal(bool)
+    def __init__(self, downloader):
+        self.downloader = downloader
 
-    def __init__(self, download_queue,
-                 masterhash, assets_url,
-                 decompress_data, output_dir):
+        threading.Thread.__init__(self)
 
-        self.stopped = False
-        self.is_running = True
+    def run(self):
+        downloader = self.downloader
 
-        self.assets_url = assets_url
-        self.masterhash = masterhash
-        self.output_dir = output_dir
-        self.download_queue = download_queue
-        self.decompress_data = decompress_data
+        while downloader.is_running:
+            # Waits here while the concurrency controller has fewer slots than there are workers
+            if not downloader.concurrency_controller.acquire():
+                return
 
-        QThread.__init__(self)
+            try:
+                filename = downloader.next_file()
 
-    def run(self):
-        while self.is_running:
-            filename = self.download_queue.get()
+                if filename is None:
+                    return
+
+                self.process(filename)
+
+            finally:
+                downloader.concurrency_controller.release()
+
+    def process(self, filename):
+        downloader = self.downloader
+        path = downloader.file_path(filename)
 
-            if filename is not None:
-                file_url = join_path(self.assets_url, self.masterhash, filename)
+        downloader.on_file_started(filename)
 
-                file_data = urlopen(file_url)
+        # Whatever goes wrong with this file, it must not take the worker down with it
+        try:
+            save_download(downloader, filename, self.download(filename, path), path)
 
-                os.makedirs(os.path.dirname(join_path(self.output_dir, filename)), exist_ok=True)
+        except Exception as error:
+            downloader.on_file_saved(filename, error)
 
-                with open(join_path(self.output_dir, filename), 'wb') as f:
-                    if self.decompress_data and filename.endswith(('.csv', '.sc')):
-                        f.write(decompress(file_data.read()))
+    def download(self, filename, path):
+        downloader = self.downloader
+        attempts = FileAttempts(downloader, filename)
 
-                    else:
-                        f.write(file_data.read())
+        while True:
+            host, delay = attempts.next_host()
+            time.sleep(delay)
 
-                    f.close()
+            try:
+                part_path, size, sha = download_file(downloader.connection_pool, downloader.file_url(host, filename), path, downloader.bandwidth_limiter, downloader.metrics)
 
-                self.file_downloaded.emit(self.is_running)
+            except HTTPError as error:
+                attempts.failed(error, error.code)
+                continue
 
-            self.download_queue.task_done()
+            except (OSError, HTTPException) as error:
+                attempts.failed(error)
+                continue
 
-    def stop(self):
-        self.download_queue.put(None)
-        self.is_running = False
+            if attempts.succeeded(part_path, size, sha):
+                return part_path
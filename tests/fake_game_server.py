@@ -0,0 +1,132 @@
+import socket
+import struct
+import threading
+import zlib
+
+
+def encode_vint(value):
+    # Zigzag encoded 7 bits groups, the first byte being rotated like lib.reader expects it
+    value = (value << 1) ^ (value >> 63)
+    encoded = bytearray()
+
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+
+        if value:
+            byte |= 0x80
+
+        if not encoded:
+            byte = (byte & 0x80) | ((byte & 1) << 6) | ((byte >> 1) & 0x3f)
+
+        encoded.append(byte)
+
+        if not value:
+            return bytes(encoded)
+
+
+def encode_string(value):
+    if value is None:
+        return b'\xff\xff\xff\xff'
+
+    encoded = value.encode('utf-8')
+
+    return len(encoded).to_bytes(4, 'big') + encoded
+
+
+def encode_compressed_string(value):
+    encoded = value.encode('utf-8')
+    compressed = zlib.compress(encoded)
+
+    return (len(compressed) + 4).to_bytes(4, 'big') + len(encoded).to_bytes(4, 'little') + compressed
+
+
+def build_login_failed(error_code, assets_hosts=(), fingerprint=''):
+    # 20103 payload, only code 7 carries the assets hosts and fingerprint
+    payload = encode_vint(error_code)
+
+    if error_code == 7:
+        payload += encode_string('') * 4 + encode_vint(0) * 2 + encode_string('')
+        payload += encode_vint(len(assets_hosts)) + b''.join(encode_string(host) for host in assets_hosts)
+        payload += encode_string('') + b'\x00' + encode_compressed_string(fingerprint)
+
+    return payload
+
+
+def receive(connection, length):
+    data = b''
+
+    while len(data) < length:
+        chunk = connection.recv(length - len(data))
+
+        if not chunk:
+            raise ConnectionError('client closed the connection')
+
+        data += chunk
+
+    return data
+
+
+class FakeGameServer:
+
+    # Answers a 10100 client hello with a 20103 login failed: 7 for the current major/build, 8 when older, 9 when newer
+
+    def __init__(self, major, build, assets_hosts=('http://127.0.0.1:8765',), fingerprint='{"sha": "abc", "files": []}'):
+        self.major = major
+        self.build = build
+        self.assets_hosts = assets_hosts
+        self.fingerprint = fingerprint
+
+        self.requests = []
+        self.lock = threading.Lock()
+
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(64)
+
+        self.port = self.socket.getsockname()[1]
+
+    def error_code(self, major, build):
+        if (major, build) == (self.major, self.build):
+            return 7
+
+        if major > self.major or (major == self.major and build > self.build):
+            return 9
+
+        return 8
+
+    def handle(self, connection):
+        with connection:
+            header = receive(connection, 7)
+
+            message_type = int.from_bytes(header[:2], 'big')
+            client_hello = receive(connection, int.from_bytes(header[2:5], 'big'))
+
+            if message_type != 10100:
+                return
+
+            major, build = struct.unpack('>II', client_hello[8:16])
+
+            with self.lock:
+                self.requests.append((major, build))
+
+            payload = build_login_failed(self.error_code(major, build), self.assets_hosts, self.fingerprint)
+
+            connection.sendall((20103).to_bytes(2, 'big') + len(payload).to_bytes(3, 'big') + bytes(2) + payload)
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+
+            except OSError:
+                # Closed by stop()
+                return
+
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def stop(self):
+        self.socket.close()
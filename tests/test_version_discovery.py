@@ -0,0 +1,80 @@
+import unittest
+
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import lib.protocol
+
+from lib.protocol import request_login_failed, read_assets_info
+from lib.version_discovery import find_highest, discover_version
+from tests.fake_game_server import FakeGameServer
+
+
+class FindHighestTest(unittest.TestCase):
+
+    def test_finds_highest_valid_value(self):
+        with ThreadPoolExecutor(4) as executor:
+            for start, highest in [(0, 0), (5, 5), (5, 6), (5, 37), (100, 4100), (300, 256), (1, 0)]:
+                self.assertEqual(find_highest(lambda value: value > highest, start, 4, executor), highest, (start, highest))
+
+    def test_probes_grow_exponentially(self):
+        probes = []
+
+        def is_too_high(value):
+            probes.append(value)
+            return value > 100000
+
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(find_highest(is_too_high, 0, 1, executor), 100000)
+
+        # Stepping one value at a time would take 100000 probes
+        self.assertLess(len(probes), 50)
+
+
+class FakeGameServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeGameServer(6, 256, ['http://127.0.0.1:8765', 'http://127.0.0.1:8766'], '{"sha": "abc", "files": []}')
+        self.server.start()
+
+        patcher = mock.patch.multiple(lib.protocol, GAME_HOST='127.0.0.1', GAME_PORT=self.server.port)
+        patcher.start()
+
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.stop)
+
+    def test_login_failed_codes(self):
+        self.assertEqual(request_login_failed(6, 255).read_vint(), 8)
+        self.assertEqual(request_login_failed(5, 900).read_vint(), 8)
+        self.assertEqual(request_login_failed(6, 257).read_vint(), 9)
+        self.assertEqual(request_login_failed(7, 0).read_vint(), 9)
+
+    def test_assets_info(self):
+        login_failed = request_login_failed(6, 256)
+
+        self.assertEqual(login_failed.read_vint(), 7)
+        self.assertEqual(read_assets_info(login_failed), (['http://127.0.0.1:8765', 'http://127.0.0.1:8766'], '{"sha": "abc", "files": []}'))
+
+    def test_discover_newer_version(self):
+        probes = []
+
+        self.assertEqual(discover_version(3, 100, on_probe=lambda major, build: probes.append((major, build))), (6, 256))
+        self.assertEqual(sorted(probes), sorted(self.server.requests))
+
+    def test_discover_from_too_high_version(self):
+        self.assertEqual(discover_version(8, 1000), (6, 256))
+
+    def test_discover_current_version(self):
+        self.assertEqual(discover_version(6, 256), (6, 256))
+
+    def test_discover_big_build_jump(self):
+        self.server.build = 5000
+
+        self.assertEqual(discover_version(6, 256), (6, 5000))
+
+        # Stepping build by build would take thousands of round trips
+        self.assertLess(len(self.server.requests), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,26 @@
 import os
 import json
-import socket
 
-from queue import Queue
 from datetime import datetime
-from urllib.request import urlopen
 from urllib.error import HTTPError
 
 from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QSize, QTimer, QThread, pyqtSignal
 from PyQt5.QtWidgets import (QWidget, QLabel, QLineEdit,
                              QCheckBox, QComboBox, QHBoxLayout,
                              QVBoxLayout, QPushButton, QProgressBar,
-                             QMessageBox, QFileDialog)
+                             QMessageBox, QFileDialog, QPlainTextEdit)
 
-from lib.reader import Reader
-from lib.writer import Writer
+from lib.progress import ProgressMeter
 from lib.worker_launcher import WorkerLauncher
-from lib.utils import join_path, build_alert_box, is_fingerprint_valid, is_masterhash_valid
+from lib.downloader import Downloader, fetch_fingerprint
+from lib.batch_downloader import BatchDownloader
+from lib.fingerprint_index import FingerprintIndex
+from lib.fingerprint_diff import diff_fingerprints, changed_files, write_diff_report, load_patch_fingerprint
+from lib.version_discovery import discover_version
+from lib.assets_info_cache import AssetsInfoCache
+from lib.utils import join_path, is_fingerprint_valid, is_masterhash_valid
+from ui.utils import build_alert_box
 from ui.download_choice_window import DownloadChoiceWindow
 
 
@@ -28,8 +31,9 @@ class DownloadWidget(QWidget):
         self.parent = parent
         self.config = config
         self.masterhash = None
-        self.assets_host = None
+        self.assets_hosts = None
         self.fingerprint = None
+        self.fingerprints = None
 
         self.download_started = False
         self.bruteforce_started = False
@@ -37,9 +41,20 @@ class DownloadWidget(QWidget):
         self.major = self.config['major']
         self.build = self.config['build']
 
+        self.assets_info_cache = AssetsInfoCache('assets_info_cache.json', self.config.get('assets_info_ttl', 300))
+
         self.total_files = 0
+        self.reused_files = 0
         self.downloaded_files = 0
 
+        self.downloader = None
+        self.fingerprint_diff = None
+
+        # Refreshing the progress 10 times per second keeps the event loop free whatever the files rate
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(100)
+        self.progress_timer.timeout.connect(self.update_download_count)
+
         self.init_ui()
 
     def init_ui(self):
@@ -55,7 +70,7 @@ class DownloadWidget(QWidget):
         self.left_panel_layout = QVBoxLayout()
 
         self.download_method_combo_box = QComboBox()
-        self.download_method_combo_box.addItems(['Latest Patch', 'Masterhash', 'Fingerprint file'])
+        self.download_method_combo_box.addItems(['Latest Patch', 'Masterhash', 'Fingerprint file', 'Batch'])
         self.download_method_combo_box.currentIndexChanged.connect(self.on_combo_box_change)
 
         self.masterhash_input = QLineEdit()
@@ -96,14 +111,46 @@ class DownloadWidget(QWidget):
         self.browse_fingerprint_widget.setLayout(self.browse_fingerprint_layout)
         self.browse_fingerprint_widget.hide()
 
+        self.batch_widget = QWidget()
+        self.batch_layout = QVBoxLayout()
+
+        self.batch_input = QPlainTextEdit()
+        self.batch_input.setPlaceholderText('One masterhash or fingerprint file per line')
+
+        self.browse_batch_button = QPushButton('Add fingerprints', self)
+        self.browse_batch_button.setIcon(QIcon('ui/assets/browse.png'))
+        self.browse_batch_button.setIconSize(QSize(17, 17))
+        self.browse_batch_button.clicked.connect(self.browse_batch_fingerprints)
+
+        self.batch_layout.addWidget(self.batch_input)
+        self.batch_layout.addWidget(self.browse_batch_button)
+
+        self.batch_widget.setLayout(self.batch_layout)
+        self.batch_widget.hide()
+
         self.enable_compression_checkbox = QCheckBox('Enable LZMA/LZHAM\ndecompression for\nCSV / SC files')
+        self.incremental_sync_checkbox = QCheckBox('Reuse files from\npreviously downloaded\npatches')
+
+        self.diff_checkbox = QCheckBox('Only download changes\nsince masterhash')
+        self.diff_checkbox.toggled.connect(self.on_diff_checkbox_toggled)
+
+        self.diff_masterhash_input = QLineEdit()
+
+        self.diff_masterhash_input.setPlaceholderText('Enter a masterhash')
+        self.diff_masterhash_input.setAlignment(Qt.AlignCenter)
+        self.diff_masterhash_input.setMaxLength(40)
+        self.diff_masterhash_input.hide()
 
         self.left_panel_layout.addWidget(QLabel('Download from:'))
         self.left_panel_layout.addWidget(self.download_method_combo_box)
         self.left_panel_layout.addWidget(self.masterhash_input)
         self.left_panel_layout.addWidget(self.masterhash_validity_widget)
         self.left_panel_layout.addWidget(self.browse_fingerprint_widget)
+        self.left_panel_layout.addWidget(self.batch_widget)
         self.left_panel_layout.addWidget(self.enable_compression_checkbox)
+        self.left_panel_layout.addWidget(self.incremental_sync_checkbox)
+        self.left_panel_layout.addWidget(self.diff_checkbox)
+        self.left_panel_layout.addWidget(self.diff_masterhash_input)
 
         self.left_panel_layout.addStretch(1)
 
@@ -155,6 +202,7 @@ class DownloadWidget(QWidget):
         if method == 'Latest Patch':
             self.masterhash_input.hide()
             self.browse_fingerprint_widget.hide()
+            self.batch_widget.hide()
 
         elif method == 'Masterhash':
             masterhash = self.masterhash_input.text()
@@ -164,10 +212,20 @@ class DownloadWidget(QWidget):
 
             self.masterhash_input.show()
             self.browse_fingerprint_widget.hide()
+            self.batch_widget.hide()
 
-        else:
+        elif method == 'Fingerprint file':
             self.masterhash_input.hide()
             self.browse_fingerprint_widget.show()
+            self.batch_widget.hide()
+
+        else:
+            self.masterhash_input.hide()
+            self.browse_fingerprint_widget.hide()
+            self.batch_widget.show()
+
+    def on_diff_checkbox_toggled(self, checked):
+        self.diff_masterhash_input.setVisible(checked)
 
     def browse_fingerprint(self):
         fingerprint_path, _ = QFileDialog.getOpenFileName(self, 'Open fingerprint',
@@ -175,6 +233,16 @@ class DownloadWidget(QWidget):
 
         self.fingerprint_path_input.setText(fingerprint_path)
 
+    def browse_batch_fingerprints(self):
+        fingerprint_paths, _ = QFileDialog.getOpenFileNames(self, 'Open fingerprints',
+                                                            '', "JSON file (*.json)")
+
+        for fingerprint_path in fingerprint_paths:
+            self.batch_input.appendPlainText(fingerprint_path)
+
+    def batch_patches(self):
+        return [line.strip() for line in self.batch_input.toPlainText().splitlines() if line.strip()]
+
     def request_info(self):
         download_method = self.download_method_combo_box.currentText()
 
@@ -208,6 +276,44 @@ class DownloadWidget(QWidget):
             else:
                 return build_alert_box('Missing fingerprint', 'Please select a fingerprint first !')
 
+        elif download_method == 'Batch':
+            patches = self.batch_patches()
+
+            if not patches:
+                return build_alert_box('Missing patches', 'Please enter masterhashes or add fingerprints first !')
+
+            if self.diff_checkbox.isChecked():
+                return build_alert_box('Diff error', 'Only download changes works with a single patch, not with a batch !')
+
+            # Fingerprint files are read now, masterhashes are replaced by their fingerprint once the assets hosts are known
+            self.fingerprints = []
+
+            for patch in patches:
+                if is_masterhash_valid(patch):
+                    self.fingerprints.append(patch)
+
+                elif os.path.isfile(patch):
+                    with open(patch) as f:
+                        try:
+                            fingerprint = json.load(f)
+
+                        except json.decoder.JSONDecodeError:
+                            return build_alert_box('Invalid fingerprint', 'Couldn\'t parse fingerprint {} !'.format(patch))
+
+                    if not is_fingerprint_valid(fingerprint):
+                        return build_alert_box('Invalid fingerprint', 'Fingerprint {} is missing needed fields !'.format(patch))
+
+                    self.fingerprints.append(fingerprint)
+
+                else:
+                    return build_alert_box('Invalid patch', '{} is neither a masterhash nor a fingerprint file !'.format(patch))
+
+        if self.diff_checkbox.isChecked():
+            diff_masterhash = self.diff_masterhash_input.text()
+
+            if not diff_masterhash or not is_masterhash_valid(diff_masterhash):
+                return build_alert_box('Invalid masterhash', 'Please enter a valid masterhash to diff with !')
+
         self.parent.show_loading()
         self.parent.status_bar_label.setText('Fetching assets host & fingerprint from supercell servers')
 
@@ -216,37 +322,20 @@ class DownloadWidget(QWidget):
 
         self.info_fetcher_thread.start()
 
-    def on_info_fetched(self, login_failed):
+    def on_info_fetched(self, assets_info):
         self.info_fetcher_thread.quit()
 
         download_method = self.download_method_combo_box.currentText()
 
-        login_failed_error_code = login_failed.read_vint()
+        login_failed_error_code, assets_hosts, fingerprint = assets_info
 
         if login_failed_error_code == 7:
-            login_failed.read_string()
-
-            login_failed.read_string()
-            login_failed.read_string()
-            login_failed.read_string()
-            login_failed.read_vint()
-            login_failed.read_vint()
-            login_failed.read_string()
-
-            assets_host_count = login_failed.read_vint()
-
-            if assets_host_count:
-                for _ in range(assets_host_count):
-                    self.assets_host = login_failed.read_string()
+            if assets_hosts:
+                self.assets_hosts = assets_hosts
 
             else:
                 return build_alert_box('Download error', 'Couldn\'t find any host to download assets !')
 
-            login_failed.read_string()
-            login_failed.read_byte()
-
-            fingerprint = login_failed.read_compressed_string()
-
         elif login_failed_error_code == 8:
             reply = QMessageBox.question(
                 self, 'Warning', 'Can\'t fetch current info, build and major from config are outdated. There was probably a game update, would you like to automatically update them ?', QMessageBox.Yes | QMessageBox.No)
@@ -269,57 +358,72 @@ class DownloadWidget(QWidget):
             masterhash = self.masterhash_input.text()
 
             try:
-                self.fingerprint = json.load(urlopen(self.assets_host + '/' + masterhash + '/fingerprint.json'))
+                self.fingerprint = fetch_fingerprint(self.assets_hosts, masterhash)
 
             except HTTPError:
                 self.parent.reset_status_bar()
                 return build_alert_box('Download error', 'Couldn\'t fetch any fingerprint for this masterhash !')
 
-        self.parent.hide_loading()
-        self.parent.status_bar_label.setText('Fingerprint successfully fetched, version: {}'.format(self.fingerprint['version']))
+        if download_method == 'Batch':
+            for index, fingerprint in enumerate(self.fingerprints):
+                if isinstance(fingerprint, dict):
+                    continue
 
-        files_extension = []
+                try:
+                    self.fingerprints[index] = fetch_fingerprint(self.assets_hosts, fingerprint)
 
-        for file in self.fingerprint['files']:
-            ext = os.path.splitext(file['file'])[1]
+                except HTTPError:
+                    self.parent.reset_status_bar()
+                    return build_alert_box('Download error', 'Couldn\'t fetch any fingerprint for masterhash {} !'.format(fingerprint))
 
-            if ext not in files_extension:
-                files_extension.append(ext)
+            self.fingerprint = self.fingerprints[0]
 
-        self.start_button.setEnabled(False)
-        self.download_method_combo_box.setEnabled(False)
+        else:
+            self.fingerprints = None
 
-        download_choice_windows = DownloadChoiceWindow(self, files_extension)
-        download_choice_windows.show()
+        self.fingerprint_diff = None
+
+        if self.diff_checkbox.isChecked():
+            output_path = self.parent.settings_widget.folder_path_input.text()
+
+            try:
+                old_fingerprint = load_patch_fingerprint(output_path, self.assets_hosts, self.diff_masterhash_input.text())
+
+            except HTTPError:
+                self.parent.reset_status_bar()
+                return build_alert_box('Download error', 'Couldn\'t fetch any fingerprint for the masterhash to diff with !')
+
+            self.fingerprint_diff = diff_fingerprints(old_fingerprint, self.fingerprint)
+
+        self.parent.hide_loading()
 
-    def request_login_failed(self):
-        client_hello_writer = Writer()
+        if self.fingerprint_diff is not None:
+            self.parent.status_bar_label.setText('Fingerprint successfully fetched, version: {}, {} files added, {} modified, {} removed'.format(self.fingerprint['version'],
+                                                                                                                                            len(self.fingerprint_diff['added']),
+                                                                                                                                            len(self.fingerprint_diff['modified']),
+                                                                                                                                            len(self.fingerprint_diff['removed'])))
 
-        client_hello_writer.write_int(3)
-        client_hello_writer.write_int(27)
-        client_hello_writer.write_int(self.major)
-        client_hello_writer.write_int(self.build)
-        client_hello_writer.write_int(0)
-        client_hello_writer.write_string('')
-        client_hello_writer.write_int(2)
-        client_hello_writer.write_int(2)
+        elif self.fingerprints is not None:
+            self.parent.status_bar_label.setText('{} fingerprints successfully fetched, versions: {}'.format(len(self.fingerprints),
+                                                                                                         ', '.join(fingerprint['version'] for fingerprint in self.fingerprints)))
 
-        client_hello = (10100).to_bytes(2, 'big') + len(client_hello_writer.buffer).to_bytes(3, 'big') + bytes(2) + client_hello_writer.buffer
+        else:
+            self.parent.status_bar_label.setText('Fingerprint successfully fetched, version: {}'.format(self.fingerprint['version']))
 
-        s = socket.create_connection(('game.clashroyaleapp.com', 9339))
-        s.send(client_hello)
+        if self.fingerprints is not None:
+            files_extension = []
 
-        header = s.recv(7)
-        message_length = int.from_bytes(header[2:5], 'big')
+            for fingerprint in self.fingerprints:
+                files_extension += [extension for extension in FingerprintIndex(fingerprint).extensions if extension not in files_extension]
 
-        login_failed = b''
+        else:
+            files_extension = FingerprintIndex(self.fingerprint).extensions
 
-        while message_length:
-            data = s.recv(message_length)
-            message_length -= len(data)
-            login_failed += data
+        self.start_button.setEnabled(False)
+        self.download_method_combo_box.setEnabled(False)
 
-        return Reader(login_failed)
+        download_choice_windows = DownloadChoiceWindow(self, files_extension)
+        download_choice_windows.show()
 
     def update_client_hello_version(self):
         self.start_button.setEnabled(False)
@@ -329,6 +433,7 @@ class DownloadWidget(QWidget):
 
         self.bruteforce_thread = UpdateClientHelloVersionThread(self)
 
+        self.bruteforce_thread.probing.connect(self.display_bruteforce_info)
         self.bruteforce_thread.values_found.connect(self.on_values_found)
 
         self.bruteforce_thread.start()
@@ -341,6 +446,7 @@ class DownloadWidget(QWidget):
 
         self.config['major'] = self.major
         self.config['build'] = self.build
+        self.config['version_found_at'] = datetime.utcnow().isoformat()
 
         self.parent.save_config()
 
@@ -365,66 +471,129 @@ class DownloadWidget(QWidget):
     def start_download(self, wanted_extensions):
         self.downloaded_files = 0
         self.download_start_time = datetime.utcnow()
-        self.download_queue = Queue()
+
+        settings_widget = self.parent.settings_widget
+        output_path = settings_widget.folder_path_input.text()
+        engine = settings_widget.download_engine_combo_box.currentText()
 
         overwrite_existing_file = False
 
-        if os.path.isdir(join_path(self.parent.settings_widget.folder_path_input.text(), self.fingerprint['sha'])):
+        fingerprints = self.fingerprints if self.fingerprints is not None else [self.fingerprint]
+
+        if any(os.path.isdir(join_path(output_path, fingerprint['sha'])) for fingerprint in fingerprints):
             reply = QMessageBox.question(self, 'Warning', 'This patch was already downloaded, would you like to overwrite existing files ?', QMessageBox.Yes | QMessageBox.No)
 
             if reply == QMessageBox.Yes:
                 overwrite_existing_file = True
 
-        self.fingerprint['files'].append({'file': 'fingerprint.json'})
+        if self.fingerprint_diff is not None:
+            wanted_files = changed_files(self.fingerprint_diff)
+            write_diff_report(join_path(output_path, self.fingerprint['sha']), self.fingerprint_diff)
 
-        for file in self.fingerprint['files']:
-            if file['file'].endswith(wanted_extensions):
-                if overwrite_existing_file:
-                    self.download_queue.put(file['file'])
+        else:
+            wanted_files = None
 
-                else:
-                    if not os.path.isfile(join_path(self.parent.settings_widget.folder_path_input.text(), self.fingerprint['sha'], file['file'])):
-                        self.download_queue.put(file['file'])
+        if engine == 'Asyncio':
+            self.workers_count = settings_widget.concurrency_spinbox.value()
+
+        else:
+            self.workers_count = settings_widget.workers_spinbox.value()
+
+        options = dict(wanted_extensions=wanted_extensions,
+                       workers_count=self.workers_count,
+                       engine=engine,
+                       decompress_data=self.enable_compression_checkbox.isChecked(),
+                       incremental=self.incremental_sync_checkbox.isChecked(),
+                       overwrite=overwrite_existing_file,
+                       priority_extensions=settings_widget.priority_extensions(),
+                       request_timeout=settings_widget.request_timeout_spinbox.value(),
+                       max_retries=settings_widget.max_retries_spinbox.value(),
+                       max_bandwidth=settings_widget.max_download_speed_spinbox.value() * 1024,
+                       max_requests=settings_widget.max_requests_spinbox.value(),
+                       auto_workers=settings_widget.auto_workers_checkbox.isChecked(),
+                       deduplicate=settings_widget.deduplicate_checkbox.isChecked(),
+                       wanted_files=wanted_files,
+                       metrics_textfile=settings_widget.metrics_textfile_input.text() or None)
+
+        # A batch shares one queue, pool of workers and connections between its patches, each shared file is downloaded once
+        if self.fingerprints is not None:
+            self.downloader = BatchDownloader(self.fingerprints, self.assets_hosts, output_path, **options)
+
+        else:
+            self.downloader = Downloader(self.fingerprint, self.assets_hosts, output_path, **options)
 
-        self.total_files = self.download_queue.qsize()
+        self.downloader.prepare()
+
+        self.total_files = self.downloader.total_files
+        self.reused_files = self.downloader.reused_files
 
         self.parent.show_loading()
 
-        self.worker_launcher = WorkerLauncher(self)
+        self.progress_meter = ProgressMeter(self.total_files)
 
-        self.worker_launcher.file_downloaded.connect(self.update_download_count)
+        self.worker_launcher = WorkerLauncher(self.downloader)
         self.worker_launcher.download_finished.connect(self.on_donwload_finish)
 
         self.worker_launcher.start()
+        self.progress_timer.start()
+
+    def update_download_count(self):
+        with self.downloader.lock:
+            self.downloaded_files = self.downloader.downloaded_files
+            processed_files = self.downloaded_files + len(self.downloader.failed_files)
+            downloaded_bytes = self.downloader.downloaded_bytes
+
+        self.progress_meter.update(processed_files, downloaded_bytes)
 
-    def update_download_count(self, update_status):
-        self.downloaded_files += 1
+        if self.total_files:
+            self.progress_bar.setValue(int(processed_files / self.total_files * 100))
 
-        if update_status:
-            self.progress_bar.setValue(int(self.downloaded_files / self.total_files * 100))
-            self.parent.status_bar_label.setText('Download started with {} workers, {}/{} files downloaded !'.format(self.workers_count,
-                                                                                                                     self.downloaded_files,
-                                                                                                                     self.total_files))
+        self.parent.status_bar_label.setText('Download started with {} workers, {}/{} files downloaded ! ({}){}'.format(self.downloader.concurrency_controller.limit,
+                                                                                                                    self.downloaded_files,
+                                                                                                                    self.total_files,
+                                                                                                                    self.progress_meter.summary(),
+                                                                                                                    self.patches_progress()))
+
+    def patches_progress(self):
+        if self.fingerprints is None:
+            return ''
+
+        return ' | ' + ', '.join('{}: {}/{}'.format(job.masterhash[:8], job.downloaded_files, job.total_files) for job in self.downloader.jobs)
 
     def on_donwload_finish(self):
+        self.progress_timer.stop()
+        self.downloaded_files = self.downloader.downloaded_files
+
         self.parent.hide_loading()
         self.download_method_combo_box.setEnabled(True)
 
-        if self.downloaded_files:
+        if self.downloaded_files or self.reused_files:
             elapsed_time = (datetime.utcnow() - self.download_start_time).seconds
 
-            self.parent.status_bar_label.setText('''Download finished ! {} files downloaded in {}min {}s'''.format(self.downloaded_files,
-                                                                                                                   *divmod(elapsed_time, 60)))
+            self.parent.status_bar_label.setText('''Download finished ! {} files downloaded, {} reused from previous patches in {}min {}s ({})'''.format(self.downloaded_files,
+                                                                                                                                                    self.reused_files,
+                                                                                                                                                    *divmod(elapsed_time, 60),
+                                                                                                                                                    self.downloader.stats_summary()))
 
         else:
             self.parent.status_bar_label.setText('No files were downloaded !')
 
+        failed_files = self.downloader.failed_files
+
+        if failed_files:
+            details = '<br>'.join('{}: {}'.format(filename, error) for filename, error in failed_files[:10])
+
+            if len(failed_files) > 10:
+                details += '<br>...'
+
+            build_alert_box('Download incomplete', '{} files couldn\'t be downloaded, start the download again to retry them:<br><br>{}'.format(len(failed_files), details))
+
         self.progress_bar.reset()
         self.stop_button.setEnabled(False)
         self.start_button.setEnabled(True)
 
-    def display_bruteforce_info(self):
-        self.parent.status_bar_label.setText('Bruteforce started ! Trying with major {} and build {}'.format(self.major, self.build))
+    def display_bruteforce_info(self, major, build):
+        self.parent.status_bar_label.setText('Bruteforce started ! Trying with major {} and build {}'.format(major, build))
 
 
 class InfoFetcherThread(QThread):
@@ -435,13 +604,14 @@ class InfoFetcherThread(QThread):
         QThread.__init__(self)
 
     def run(self):
-        login_failed = self.parent.request_login_failed()
+        assets_info = self.parent.assets_info_cache.fetch(self.parent.major, self.parent.build)
 
-        self.info_fetched.emit(login_failed)
+        self.info_fetched.emit(assets_info)
 
 
 class UpdateClientHelloVersionThread(QThread):
 
+    probing = pyqtSignal(int, int)
     values_found = pyqtSignal()
 
     def __init__(self, parent):
@@ -449,34 +619,6 @@ class UpdateClientHelloVersionThread(QThread):
         QThread.__init__(self)
 
     def run(self):
-        major_found = False
-        build_found = False
-
-        # Check major first with build 0 to avoid getting error code 9 due to too high build instead of too high major
-        build = self.parent.build
-
-        self.parent.build = 0
-
-        while not major_found:
-            self.parent.major += 1
-            self.parent.display_bruteforce_info()
-            login_failed = self.parent.request_login_failed()
-
-            major_found = login_failed.read_vint() == 9
-
-        self.parent.major -= 1
-        self.parent.build = build
-
-        reset_build = self.parent.request_login_failed().read_vint() == 9
-
-        if reset_build:
-            self.parent.build = 0
-
-        while not build_found:
-            self.parent.build += 1
-            self.parent.display_bruteforce_info()
-            login_failed = self.parent.request_login_failed()
-
-            build_found = login_failed.read_vint() == 7
+        self.parent.major, self.parent.build = discover_version(self.parent.major, self.parent.build, on_probe=self.probing.emit)
 
         self.values_found.emit()
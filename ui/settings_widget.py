@@ -3,8 +3,13 @@ import os
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QSize
 from PyQt5.QtWidgets import (QWidget, QLabel, QSpinBox,
-                             QLineEdit, QHBoxLayout, QVBoxLayout,
-                             QPushButton, QFileDialog)
+                             QLineEdit, QComboBox, QHBoxLayout,
+                             QVBoxLayout, QCheckBox, QPushButton,
+                             QFileDialog)
+
+from lib.blob_store import BlobStore
+from lib.utils import normalize_extensions
+from ui.utils import build_alert_box
 
 
 class SettingsWidget(QWidget):
@@ -43,8 +48,62 @@ class SettingsWidget(QWidget):
 
         self.workers_spinbox = QSpinBox()
 
-        self.workers_spinbox.setRange(1, 10)
-        self.workers_spinbox.setValue(max(min(self.config['workers_count'], 10), 1))
+        self.workers_spinbox.setRange(1, 128)
+        self.workers_spinbox.setValue(max(min(self.config['workers_count'], 128), 1))
+
+        self.auto_workers_checkbox = QCheckBox('Adjust workers count automatically, up to the count above')
+        self.auto_workers_checkbox.setChecked(self.config.get('auto_workers', False))
+
+        self.download_engine_combo_box = QComboBox()
+        self.download_engine_combo_box.addItems(['Threads', 'Asyncio'])
+        self.download_engine_combo_box.setCurrentText(self.config.get('download_engine', 'Threads'))
+
+        self.concurrency_spinbox = QSpinBox()
+
+        self.concurrency_spinbox.setRange(1, 500)
+        self.concurrency_spinbox.setValue(max(min(self.config.get('async_concurrency', 100), 500), 1))
+
+        self.request_timeout_spinbox = QSpinBox()
+
+        self.request_timeout_spinbox.setRange(1, 300)
+        self.request_timeout_spinbox.setValue(max(min(self.config.get('request_timeout', 30), 300), 1))
+
+        self.max_retries_spinbox = QSpinBox()
+
+        self.max_retries_spinbox.setRange(0, 10)
+        self.max_retries_spinbox.setValue(max(min(self.config.get('max_retries', 3), 10), 0))
+
+        self.max_download_speed_spinbox = QSpinBox()
+
+        self.max_download_speed_spinbox.setRange(0, 1000000)
+        self.max_download_speed_spinbox.setSpecialValueText('Unlimited')
+        self.max_download_speed_spinbox.setSuffix(' KB/s')
+        self.max_download_speed_spinbox.setValue(max(min(self.config.get('max_download_speed', 0), 1000000), 0))
+        self.max_download_speed_spinbox.valueChanged.connect(self.update_limits)
+
+        self.max_requests_spinbox = QSpinBox()
+
+        self.max_requests_spinbox.setRange(0, 10000)
+        self.max_requests_spinbox.setSpecialValueText('Unlimited')
+        self.max_requests_spinbox.setValue(max(min(self.config.get('max_requests_per_second', 0), 10000), 0))
+        self.max_requests_spinbox.valueChanged.connect(self.update_limits)
+
+        self.priority_extensions_input = QLineEdit()
+        self.priority_extensions_input.setPlaceholderText('e.g. .csv, .sc')
+        self.priority_extensions_input.setText(', '.join(self.config.get('priority_extensions', [])))
+
+        self.deduplicate_checkbox = QCheckBox('Store files shared by several patches only once (hardlinks)')
+        self.deduplicate_checkbox.setChecked(self.config.get('deduplicate_files', False))
+
+        self.metrics_textfile_input = QLineEdit()
+        self.metrics_textfile_input.setPlaceholderText('e.g. /var/lib/node_exporter/sc_assets.prom, empty to disable')
+        self.metrics_textfile_input.setText(self.config.get('metrics_textfile', ''))
+
+        self.collect_garbage_button = QPushButton('Delete stored files no patch uses anymore', self)
+        self.collect_garbage_button.clicked.connect(self.collect_garbage)
+
+        self.clear_cache_button = QPushButton('Clear cached server info', self)
+        self.clear_cache_button.clicked.connect(self.clear_cache)
 
         self.save_settings_button = QPushButton('Save settings', self)
         self.save_settings_button.setIcon(QIcon('ui/assets/save.png'))
@@ -53,8 +112,28 @@ class SettingsWidget(QWidget):
 
         self.main_layout.addWidget(QLabel('Output folder:'))
         self.main_layout.addWidget(self.browse_folder_widget)
-        self.main_layout.addWidget(QLabel('Workers count (up to 10):'))
+        self.main_layout.addWidget(QLabel('Workers count (up to 128):'))
         self.main_layout.addWidget(self.workers_spinbox)
+        self.main_layout.addWidget(self.auto_workers_checkbox)
+        self.main_layout.addWidget(QLabel('Download engine:'))
+        self.main_layout.addWidget(self.download_engine_combo_box)
+        self.main_layout.addWidget(QLabel('Concurrent requests (asyncio engine, up to 500):'))
+        self.main_layout.addWidget(self.concurrency_spinbox)
+        self.main_layout.addWidget(QLabel('Request timeout (seconds):'))
+        self.main_layout.addWidget(self.request_timeout_spinbox)
+        self.main_layout.addWidget(QLabel('Retries per file:'))
+        self.main_layout.addWidget(self.max_retries_spinbox)
+        self.main_layout.addWidget(QLabel('Download speed limit:'))
+        self.main_layout.addWidget(self.max_download_speed_spinbox)
+        self.main_layout.addWidget(QLabel('Requests per second limit:'))
+        self.main_layout.addWidget(self.max_requests_spinbox)
+        self.main_layout.addWidget(QLabel('Download first (extensions):'))
+        self.main_layout.addWidget(self.priority_extensions_input)
+        self.main_layout.addWidget(QLabel('Prometheus metrics file:'))
+        self.main_layout.addWidget(self.metrics_textfile_input)
+        self.main_layout.addWidget(self.deduplicate_checkbox)
+        self.main_layout.addWidget(self.collect_garbage_button)
+        self.main_layout.addWidget(self.clear_cache_button)
         self.main_layout.addWidget(self.save_settings_button)
 
         self.setLayout(self.main_layout)
@@ -64,7 +143,36 @@ class SettingsWidget(QWidget):
         self.config['output_path'] = directory
         self.folder_path_input.setText(directory)
 
+    def priority_extensions(self):
+        return normalize_extensions(ext.strip() for ext in self.priority_extensions_input.text().split(','))
+
+    def update_limits(self):
+        # Limits apply right away to a running download
+        downloader = self.parent.download_widget.downloader
+
+        if downloader is not None:
+            downloader.bandwidth_limiter.set_rate(self.max_download_speed_spinbox.value() * 1024)
+            downloader.request_limiter.set_rate(self.max_requests_spinbox.value())
+
+    def collect_garbage(self):
+        deleted_blobs, freed_bytes = BlobStore(self.folder_path_input.text()).collect_garbage()
+
+        build_alert_box('Stored files cleaned', '{} unused files deleted, {:.2f} MB freed'.format(deleted_blobs, freed_bytes / 1024 / 1024))
+
+    def clear_cache(self):
+        self.parent.download_widget.assets_info_cache.invalidate()
+
     def save_settings(self):
         self.config['workers_count'] = self.workers_spinbox.value()
+        self.config['auto_workers'] = self.auto_workers_checkbox.isChecked()
+        self.config['deduplicate_files'] = self.deduplicate_checkbox.isChecked()
+        self.config['download_engine'] = self.download_engine_combo_box.currentText()
+        self.config['async_concurrency'] = self.concurrency_spinbox.value()
+        self.config['request_timeout'] = self.request_timeout_spinbox.value()
+        self.config['max_retries'] = self.max_retries_spinbox.value()
+        self.config['max_download_speed'] = self.max_download_speed_spinbox.value()
+        self.config['max_requests_per_second'] = self.max_requests_spinbox.value()
+        self.config['priority_extensions'] = list(self.priority_extensions())
+        self.config['metrics_textfile'] = self.metrics_textfile_input.text()
 
         self.parent.save_config()
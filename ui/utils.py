@@ -0,0 +1,10 @@
+from PyQt5.QtWidgets import QMessageBox
+
+
+def build_alert_box(title, message):
+    msg = QMessageBox()
+    msg.setWindowTitle(title)
+    msg.setText("""<p style='text-align: center;'><img src='ui/assets/warning-icon.png' alt='' width='42' height='42'/></p>
+                   <p style='align: center;'><strong>{}</strong></p>""".format(message))
+
+    msg.exec_()